@@ -0,0 +1,114 @@
+"""
+Cold-start benchmark.
+
+Starts the API with uvicorn in a fresh process for each scenario and measures, from process
+start, how long until the health check (`GET /`) answers and until warm-up has finished
+(`"ready": true`). Scenarios:
+
+- eager / no snapshot: everything loads before serving, engine parsed from the source files
+- eager / snapshot:    everything loads before serving, engine read from the data snapshot
+- lazy / no snapshot:  health check first, warm-up in the background, engine parsed
+- lazy / snapshot:     health check first, warm-up in the background, engine from snapshot
+
+Usage:
+    python bench_startup.py [--runs 5] [--json results.json]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+SCENARIOS = [
+    ("eager / no snapshot", {"STARTUP_MODE": "eager", "ENGINE_SNAPSHOT": "false"}),
+    ("eager / snapshot", {"STARTUP_MODE": "eager", "ENGINE_SNAPSHOT": "true"}),
+    ("lazy / no snapshot", {"STARTUP_MODE": "lazy", "ENGINE_SNAPSHOT": "false"}),
+    ("lazy / snapshot", {"STARTUP_MODE": "lazy", "ENGINE_SNAPSHOT": "true"}),
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def poll_health(port, timeout):
+    """The health check's JSON once it answers, or None on timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                return json.loads(response.read())
+        except Exception:
+            time.sleep(0.005)
+    return None
+
+
+def run_once(env_overrides, snapshot_path, timeout=60):
+    port = free_port()
+    env = dict(os.environ, ENGINE_SNAPSHOT_PATH=snapshot_path, **env_overrides)
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_PATH, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        health = poll_health(port, timeout)
+        if health is None:
+            raise RuntimeError("server did not answer the health check")
+        health_s = time.monotonic() - started
+
+        while not health.get("ready"):
+            if time.monotonic() - started > timeout:
+                raise RuntimeError("warm-up did not finish")
+            time.sleep(0.01)
+            health = poll_health(port, timeout)
+        ready_s = time.monotonic() - started
+        return health_s, ready_s
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_path = os.path.join(tmp, "engine_snapshot.pkl")
+        # Write the snapshot once so the snapshot scenarios measure a warm cache
+        run_once({"STARTUP_MODE": "eager", "ENGINE_SNAPSHOT": "true"}, snapshot_path)
+
+        for name, env in SCENARIOS:
+            timings = [run_once(env, snapshot_path) for _ in range(args.runs)]
+            health = [t[0] for t in timings]
+            ready = [t[1] for t in timings]
+            results.append({
+                "scenario": name,
+                "runs": args.runs,
+                "health_median_ms": round(statistics.median(health) * 1000, 1),
+                "health_max_ms": round(max(health) * 1000, 1),
+                "ready_median_ms": round(statistics.median(ready) * 1000, 1),
+                "ready_max_ms": round(max(ready) * 1000, 1),
+            })
+            print(f"⏱️ {name:<22} health {results[-1]['health_median_ms']:>8.1f} ms   ready {results[-1]['ready_median_ms']:>8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📝 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Offline benchmark suite (no network, no API key).
+
+Micro-benchmarks time the engine functions over a grid of profiles and policy types:
+calculate_needs, estimate_premium, calculate_suitability_score, get_recommendation and
+get_recommendations_batch. The end-to-end benchmark replays the salesperson flow through
+/chat with FastAPI's test client while a scripted fake Gemini (fake_gemini.py) answers and
+calls the tools, so it measures everything on our side of the model.
+
+Results are written as JSON; pass a previous run to --compare to see the change per
+benchmark (e.g. between two commits).
+
+Usage:
+    python bench_suite.py [--quick] [--only micro|e2e] [--json results.json] [--compare baseline.json]
+"""
+import argparse
+import contextlib
+import datetime
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+AGES = (18, 25, 30, 35, 42, 50, 58, 65)
+INCOMES = (300000, 800000, 1500000, 3000000, 10000000)
+SMOKER = (False, True)
+GENDERS = ("Male", "Female")
+COVER_TYPES = ("Flat", "Increasing", "Decreasing", "Return of Premium")
+POLICY_TYPES = ("Pure Term", "Return of Premium", "TULIP")
+
+
+def profile_grid():
+    return [
+        {"age": age, "income": income, "liabilities": income // 2, "smoker": smoker, "gender": gender,
+         "is_rop": cover_type == "Return of Premium", "cover_type": cover_type, "policy_type": policy_type}
+        for age, income, smoker, gender, cover_type, policy_type
+        in itertools.product(AGES, INCOMES, SMOKER, GENDERS, COVER_TYPES, POLICY_TYPES)
+    ]
+
+
+def summarize(name, durations, unit_calls=1):
+    """Timing summary of `durations` (seconds per sample, each covering `unit_calls` calls)."""
+    per_call = sorted(d / unit_calls * 1e6 for d in durations)
+    return {
+        "name": name,
+        "samples": len(per_call),
+        "calls": len(per_call) * unit_calls,
+        "mean_us": round(statistics.fmean(per_call), 3),
+        "p50_us": round(per_call[len(per_call) // 2], 3),
+        "p95_us": round(per_call[min(len(per_call) - 1, int(len(per_call) * 0.95))], 3),
+    }
+
+
+def time_calls(fn, args_list, repeat):
+    durations = []
+    for _ in range(repeat):
+        for args in args_list:
+            started = time.perf_counter()
+            fn(*args)
+            durations.append(time.perf_counter() - started)
+    return durations
+
+
+# --- Micro-benchmarks ---
+
+def run_micro(repeat):
+    from logic import InsuranceEngine, normalise_policy_type
+
+    engine = InsuranceEngine()
+    grid = profile_grid()
+    results = []
+
+    args = [(p["income"], p["liabilities"], p["age"]) for p in grid]
+    results.append(summarize("calculate_needs", time_calls(engine.calculate_needs, args, repeat)))
+
+    # One call per (profile, insurer offering the profile's policy type)
+    premium_args, suitability_args = [], []
+    for p in grid:
+        cover = engine.calculate_needs(p["income"], p["liabilities"], p["age"])
+        for company, candidate in engine.policy_index.get(normalise_policy_type(p["policy_type"]), {}).items():
+            premium_args.append((p["age"], cover, p["smoker"], p["is_rop"], p["gender"], company, p["cover_type"], p["policy_type"]))
+            suitability_args.append((p, candidate["policy"]))
+    results.append(summarize("estimate_premium", time_calls(engine.estimate_premium, premium_args, repeat)))
+    results.append(summarize("calculate_suitability_score", time_calls(engine.calculate_suitability_score, suitability_args, repeat)))
+
+    args = [(dict(p),) for p in grid]
+    results.append(summarize("get_recommendation", time_calls(engine.get_recommendation, args, repeat)))
+    for policy_type in POLICY_TYPES:
+        subset = [(dict(p),) for p in grid if p["policy_type"] == policy_type]
+        results.append(summarize(f"get_recommendation[{policy_type}]", time_calls(engine.get_recommendation, subset, repeat)))
+
+    # Warm cache: every profile was quoted once before
+    from recommendation_cache import RecommendationCache
+    cache = RecommendationCache(max_entries=len(grid))
+    for p in grid:
+        cache.get_recommendation(engine, dict(p))
+    results.append(summarize("get_recommendation (cache hit)", time_calls(cache.get_recommendation, [(engine, a[0]) for a in args], repeat)))
+
+    # One preference changed on the previous query (e.g. "what if I pick ROP?")
+    from logic import RecommendationQuery
+    queries = [(RecommendationQuery(engine, p), {"is_rop": not p["is_rop"]}) for p in grid]
+    for query, changes in queries:
+        query.rerank(changes) # Builds the category factors, as the first plan call would
+    results.append(summarize("RecommendationQuery.rerank (one preference changed)", time_calls(lambda q, changes: q.rerank(changes), queries, repeat)))
+
+    # Premium grid (uncached): 40 sums assured x 48 ages x 2 smoker x 3 cover types, Pure Term insurers
+    grid_spec = (tuple(2500000.0 * i for i in range(1, 41)), tuple(range(18, 66)), (False, True), ("Flat", "Increasing", "Decreasing"), ("Pure Term",), False, False)
+    results.append(summarize("premium_grid (11520 cells per insurer)", time_calls(engine._premium_grid, [grid_spec], repeat * 4)))
+
+    batch = [dict(p) for p in grid]
+    durations = [d for d in time_calls(engine.get_recommendations_batch, [(batch,)], repeat)]
+    results.append(summarize("get_recommendations_batch (per profile)", durations, unit_calls=len(batch)))
+    return results
+
+
+# --- End-to-end /chat ---
+
+def run_e2e(flows):
+    from fastapi.testclient import TestClient
+    import fake_gemini
+    import main
+
+    main.startup_ready.wait()
+    if main.startup_error is not None:
+        raise main.startup_error
+    fake = fake_gemini.install()
+
+    turn_durations = {i: [] for i in range(len(fake_gemini.SALESPERSON_FLOW))}
+    flow_durations = []
+    with TestClient(main.app) as client:
+        for _ in range(flows):
+            session_id = None
+            flow_started = time.perf_counter()
+            for i, message in enumerate(fake_gemini.SALESPERSON_FLOW):
+                started = time.perf_counter()
+                response = client.post("/chat", json={"message": message, "session_id": session_id})
+                turn_durations[i].append(time.perf_counter() - started)
+                body = response.json()
+                if "error" in body:
+                    raise RuntimeError(f"/chat failed: {body['error']}")
+                session_id = body["session_id"]
+            if not body.get("recommendations"):
+                raise RuntimeError("the flow did not end with plan recommendations")
+            flow_durations.append(time.perf_counter() - flow_started)
+
+    results = [summarize(f"chat turn {i + 1}: {msg}", turn_durations[i]) for i, msg in enumerate(fake_gemini.SALESPERSON_FLOW)]
+    results.append(summarize("chat flow (5 turns)", flow_durations))
+    results.append({"name": "fake model calls", "calls": fake.calls})
+    return results
+
+
+def configure_environment(tmp):
+    # Keep the run self-contained: no key, no files written into the repo, quiet logs
+    os.environ.update({
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY") or "offline-benchmark",
+        "STARTUP_MODE": "eager",
+        "SESSION_BACKEND": "memory",
+        "DATA_RELOAD_INTERVAL_SECONDS": "0",
+        "GEMINI_HEDGE_ENABLED": "false",
+        "CONVERSATION_LOG_PATH": os.path.join(tmp, "conversations.jsonl"),
+        "ENGINE_SNAPSHOT_PATH": os.path.join(tmp, "engine_snapshot.pkl"),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    })
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_PATH, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    print(f"\n📊 Compared with {baseline_path} (mean, negative = faster)")
+    for result in results:
+        before = baseline.get(result["name"])
+        if not before or "mean_us" not in result or "mean_us" not in before:
+            continue
+        change = (result["mean_us"] - before["mean_us"]) / before["mean_us"] * 100 if before["mean_us"] else 0.0
+        print(f"   {result['name']:<50} {before['mean_us']:>12.2f} -> {result['mean_us']:>12.2f} us  {change:+6.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--only", choices=("micro", "e2e"), help="Run one part only")
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions (smoke run)")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args(argv)
+
+    repeat, flows = (1, 5) if args.quick else (5, 50)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(tmp)
+        sys.path.insert(0, BASE_PATH)
+        # The engine and main log through `logging`; keep stray prints off the report too
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            if args.only in (None, "micro"):
+                results.extend(run_micro(repeat))
+            if args.only in (None, "e2e"):
+                results.extend(run_e2e(flows))
+
+    for result in results:
+        if "mean_us" in result:
+            print(f"⏱️ {result['name']:<50} mean {result['mean_us']:>12.2f} us   p50 {result['p50_us']:>12.2f} us   p95 {result['p95_us']:>12.2f} us")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Results written to {args.json}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
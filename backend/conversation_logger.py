@@ -0,0 +1,148 @@
+import atexit
+import datetime
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Conversation logging off the request path. Requests only enqueue a record; a background
+# writer thread drains the queue in batches, appends them as JSON lines and rotates the file
+# by size / age (optionally gzipping rotated files). Several worker processes may share one
+# file: every batch is a single O_APPEND write, and a worker that finds the file rotated by
+# another simply reopens it.
+
+_STOP = object()
+
+
+class ConversationLogger:
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, rotate_seconds=86400, compress=True,
+                 batch_size=100, flush_interval=1.0, queue_size=10000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self.dropped = 0 # Records lost because the queue was full
+        self.written = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._fd = None
+        self._opened_at = 0.0
+        self._thread = threading.Thread(target=self._run, name="conversation-logger", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- Request side ---
+
+    def log(self, record):
+        """Enqueues one record; never blocks (the record is dropped if the queue is full)."""
+        record.setdefault("timestamp", datetime.datetime.now().isoformat(timespec="milliseconds"))
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5.0):
+        """Flushes pending records and stops the writer."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    # --- Writer thread ---
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    logger.warning("⚠️ Failed to write conversation log batch (%d records): %s", len(batch), e)
+
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _open(self):
+        if self._fd is not None:
+            os.close(self._fd)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._opened_at = time.time()
+
+    def _write(self, batch):
+        self._maybe_rotate()
+        data = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in batch)
+        os.write(self._fd, data.encode("utf-8"))
+        self.written += len(batch)
+
+    def _maybe_rotate(self):
+        if self._fd is None:
+            self._open()
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._open()
+            return
+        if stat.st_ino != os.fstat(self._fd).st_ino:
+            # Rotated by another worker
+            self._open()
+            return
+
+        too_big = self.max_bytes and stat.st_size >= self.max_bytes
+        too_old = self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds and stat.st_size > 0
+        if too_big or too_old:
+            self._rotate()
+
+    def _rotate(self):
+        root, ext = os.path.splitext(self.path)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        rotated = f"{root}.{stamp}-{os.getpid()}{ext}"
+        try:
+            os.replace(self.path, rotated)
+        except FileNotFoundError:
+            pass # Another worker rotated it first
+        self._open()
+
+        if self.compress and os.path.exists(rotated):
+            with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        logger.info("🗂️ Conversation log rotated -> %s%s", rotated, ".gz" if self.compress else "")
+
+
+def create_conversation_logger():
+    """
+    Builds the ConversationLogger configured by environment variables:
+    CONVERSATION_LOG_PATH, CONVERSATION_LOG_MAX_BYTES, CONVERSATION_LOG_ROTATE_SECONDS, CONVERSATION_LOG_GZIP.
+    """
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    path = os.getenv("CONVERSATION_LOG_PATH", os.path.join(base_path, "logs", "conversations.jsonl"))
+    conversation_logger = ConversationLogger(
+        path,
+        max_bytes=int(os.getenv("CONVERSATION_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        rotate_seconds=int(os.getenv("CONVERSATION_LOG_ROTATE_SECONDS", "86400")),
+        compress=os.getenv("CONVERSATION_LOG_GZIP", "true").lower() in ("1", "true", "yes"),
+    )
+    logger.info("✅ Conversation logger writing to %s", path)
+    return conversation_logger
@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+
+logger = logging.getLogger(__name__)
+
+# Versioned binary snapshot of the engine's cleaned data (claims, product config, eligibility
+# rules, policy index, candidate column arrays). A snapshot is used only if it was written by
+# the same SNAPSHOT_VERSION from source files with the same content hashes; otherwise the
+# engine parses the sources again and rewrites it.
+#
+# File layout: MAGIC | header length | header | payload pickle | array buffers. The payload is
+# pickled with protocol 5 and its NumPy array buffers are stored out-of-band, 64-byte aligned.
+# Loading memory-maps the file and hands those buffers back to pickle, so the arrays are
+# read-only views on the mapped pages: several worker processes loading the same snapshot
+# share one copy of them through the page cache.
+#
+# Modes (ENGINE_SNAPSHOT):
+# - true: load the snapshot when it matches the sources, otherwise rebuild and rewrite it
+# - readonly: trust the snapshot as written by another process (e.g. the gunicorn master,
+#   see gunicorn.conf.py) without hashing the sources, and never write it
+# - false: always parse the sources
+
+SNAPSHOT_VERSION = 4
+MAGIC = b"ISNAP003"
+ALIGNMENT = 64
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SNAPSHOT_PATH = os.path.join(BASE_PATH, "cache", "engine_snapshot.pkl")
+
+MODE_READWRITE = "true"
+MODE_READONLY = "readonly"
+MODE_OFF = "false"
+
+
+def source_hashes(paths):
+    """{file name: sha256 of its content} (None for missing files)."""
+    hashes = {}
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                hashes[os.path.basename(path)] = hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            hashes[os.path.basename(path)] = None
+    return hashes
+
+
+def data_version(hashes):
+    """Short identifier of one set of source file contents."""
+    digest = hashlib.sha256(repr(sorted(hashes.items())).encode("utf-8")).hexdigest()
+    return digest[:12]
+
+
+def snapshot_mode():
+    mode = os.getenv("ENGINE_SNAPSHOT", MODE_READWRITE).lower()
+    if mode in ("0", "no", MODE_OFF):
+        return MODE_OFF
+    if mode == MODE_READONLY:
+        return MODE_READONLY
+    return MODE_READWRITE
+
+
+def snapshot_path():
+    """ENGINE_SNAPSHOT_PATH, or None when ENGINE_SNAPSHOT=false disables snapshots."""
+    if snapshot_mode() == MODE_OFF:
+        return None
+    return os.getenv("ENGINE_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def load_snapshot(path, hashes=None):
+    """
+    Returns (data, source hashes) from the snapshot at `path`, or (None, None) if it is
+    missing, unreadable, of another SNAPSHOT_VERSION or (when `hashes` is given) stale.
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None, None
+
+    try:
+        view = memoryview(mapped)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            logger.info("🔄 Engine snapshot has an old format, rebuilding")
+            return None, None
+        (header_len,) = struct.unpack_from("<Q", view, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = pickle.loads(view[header_start:header_start + header_len])
+
+        if header.get("version") != SNAPSHOT_VERSION or (hashes is not None and header.get("sources") != hashes):
+            logger.info("🔄 Engine snapshot is stale, rebuilding")
+            return None, None
+
+        payload_start = header_start + header_len
+        payload = view[payload_start:payload_start + header["payload_len"]]
+        buffers = [view[offset:offset + length] for offset, length in header["buffers"]]
+        # The arrays keep the mapping alive through their buffers
+        return pickle.loads(payload, buffers=buffers), header["sources"]
+    except Exception as e:
+        logger.warning("⚠️ Engine snapshot unreadable, rebuilding: %s", e)
+        return None, None
+
+
+def _header(hashes, payload_len, spans):
+    return pickle.dumps({"version": SNAPSHOT_VERSION, "sources": hashes, "payload_len": payload_len, "buffers": spans})
+
+
+def save_snapshot(path, hashes, data):
+    try:
+        buffers = []
+        payload = pickle.dumps(data, protocol=5, buffer_callback=buffers.append)
+        raw_buffers = [b.raw() for b in buffers]
+
+        def layout(header_len):
+            offset = len(MAGIC) + 8 + header_len + len(payload)
+            spans = []
+            for raw in raw_buffers:
+                offset = _align(offset)
+                spans.append((offset, raw.nbytes))
+                offset += raw.nbytes
+            return spans
+
+        # Buffer offsets depend on the header length and vice versa: iterate to a fixed point
+        header = _header(hashes, len(payload), layout(0))
+        while True:
+            spans = layout(len(header))
+            new_header = _header(hashes, len(payload), spans)
+            if len(new_header) == len(header):
+                header = new_header
+                break
+            header = new_header
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Write-then-rename so concurrent workers never read a partial snapshot (and workers
+        # that mapped the previous file keep a consistent view of it)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            f.write(payload)
+            for (offset, _), raw in zip(spans, raw_buffers):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(raw)
+        os.replace(tmp_path, path)
+        logger.info("💾 Engine snapshot written to %s", path)
+    except Exception as e:
+        logger.warning("⚠️ Failed to write engine snapshot: %s", e)
@@ -0,0 +1,58 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Polls the data files for changes (mtime + size) on a background thread and calls
+# `on_change` once a change has settled, i.e. the files look the same on two consecutive
+# polls, so a file still being copied in is not picked up half-written.
+
+
+def file_signature(paths):
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class DataWatcher:
+    def __init__(self, paths, on_change, interval=5.0):
+        self.paths = tuple(paths)
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+        self._thread.start()
+        logger.info("👀 Watching %d data files for changes (every %ss)", len(self.paths), self.interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        current = file_signature(self.paths)
+        pending = None
+        while not self._stop.wait(self.interval):
+            seen = file_signature(self.paths)
+            if seen == current:
+                pending = None
+                continue
+            if seen != pending:
+                # Changed since the last poll: wait for it to settle
+                pending = seen
+                continue
+
+            logger.info("🔄 Data files changed, reloading...")
+            try:
+                self.on_change()
+            except Exception as e:
+                logger.exception("❌ Data reload failed: %s", e)
+            # Don't retry the same file contents on failure; the next edit triggers a new attempt
+            current, pending = seen, None
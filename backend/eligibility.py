@@ -0,0 +1,244 @@
+import csv
+import datetime
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Local eligibility pre-screen. The rows of term_insurance_eligibility.csv are compiled once
+# into matchers (age thresholds and keyword/synonym patterns; negated clauses and mentions of
+# other people are skipped) that run on every user message and the known profile, so only
+# the verdicts that apply reach the model.
+
+DEFAULT_ELIGIBILITY_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "term_insurance_eligibility.csv")
+
+# Extra phrasings per condition (lowercase). Conditions without an entry match on their own
+# wording, split on "/" and " or " ("Rock or ice climbing" -> "rock climbing", "ice climbing").
+SYNONYMS = {
+    "advanced heart disease": ["heart disease", "heart failure", "heart attack", "cardiac arrest", "bypass surgery", "coronary artery disease", "heart condition", "heart problem"],
+    "active or recent cancer": ["cancer", "tumou?r", "chemo(therapy)?", "radiation therapy", "leukemia", "lymphoma", "carcinoma"],
+    "kidney failure": ["kidney failure", "renal failure", "dialysis", "kidney disease", "kidney transplant"],
+    "severe liver disease": ["liver disease", "cirrhosis", "liver failure", "hepatitis", "fatty liver"],
+    "hiv/aids": ["hiv positive", "hiv", "aids (patient|positive|diagnosis)", "(diagnosed with|suffering from|have|has|living with) aids"],
+    "major neurological disorders": ["epilepsy", "parkinson'?s", "alzheimer'?s", "multiple sclerosis", "(?<!heat )(?<!sun )(?<!brush )(?<!swimming )stroke", "neurological (disorder|disease|condition)", "seizures?", "dementia"],
+    "miners": ["(?<!bitcoin )(?<!crypto )(?<!data )miners?", "coal mine", "mine worker", "(work|working|job|employed) (in|at) (an? |the )?(coal |underground )?mines?",
+               "(work|working|job|employed) in (the )?mining", "mining (engineer|worker|labou?rer|job|industry|company)"],
+    "offshore oil rig workers": ["oil rig", "offshore (rig|platform)", "drilling platform"],
+    "deep-sea divers": ["deep[- ]sea diver", "commercial diver", "saturation diver"],
+    "explosive handlers": ["explosives?", "blasting", "demolition", "fireworks factory", "ammunition"],
+    "fighter pilots / stunt professionals": ["fighter pilot", "air force pilot", "stunt ?(man|woman|person|professional|performer)?s?", "stunts"],
+    "skydiving / paragliding": ["sky ?diving", "skydive", "paragliding", "para ?gliding", "base jumping", "bungee"],
+    "professional racing": ["professional (racing|racer|race car driver|motorsports?)", "race car driver", "racing driver", "(racer|race) by profession",
+                            "(work|working|job|career) (as an?|in) (racer|racing|motorsports?)", "i(?:'m| am) an? (racer|professional racer)", "motorsports? (driver|professional)"],
+    "rock or ice climbing": ["rock climbing", "ice climbing", "mountaineering", "bouldering", "climb mountains"],
+    "deep scuba diving": ["scuba", "deep diving", "free ?diving"],
+    "heavy smoking": ["heavy smoker", "chain smok(er|ing)", "smoke (a|one|two|\\d+) packs?", "packs? a day", "\\d+ cigarettes"],
+    "alcohol addiction": ["alcoholic", "alcohol addiction", "alcoholism", "drink (heavily|a lot|every day|daily)", "heavy drinker", "addicted to alcohol"],
+    "drug abuse history": ["drug abuse", "drug addiction", "addicted to drugs", "drug user", "narcotics", "cocaine", "heroin"],
+    "no stable income proof": ["no income", "no (stable |fixed |regular )?job", "unemployed", "jobless", "no income proof", "no salary", "not (working|employed)", "(do ?n[o']?t|dont) have (an? )?(income|job|salary)", "between jobs"],
+}
+
+# Conditions whose phrasings already contain a negation ("no income"), so the negation
+# check must not suppress them
+NEGATION_PHRASED = {"no stable income proof"}
+
+# A negation earlier in the same clause cancels a match ("no heart disease", "never smoked",
+# "I don't have any heart disease or cancer")
+NEGATION = re.compile(
+    r"\b(no|not|never|none|nil|without|don'?t|do not|doesn'?t|does not|didn'?t|did not|haven'?t|have not|hasn'?t|"
+    r"free of|quit|stopped|ex|former(ly)?|neither|nor)\b"
+)
+CLAUSE_BREAK = re.compile(r"[.,;!?\n]|\bbut\b|\bhowever\b|\bthough\b|\band (i|i'm|i've|my)\b")
+
+# Mentions about someone else ("My father had cancer", "his diabetes") are not the user's
+# condition: the subject / possessive nearest before the match decides whose it is
+FIRST_PERSON = re.compile(r"\b(i|i'm|i've|im|me|my|myself)\b")
+THIRD_PARTY = re.compile(
+    r"\b(father|mother|dad|mom|mum|parents?|brother|sister|siblings?|uncle|aunt|cousin|grand(father|mother|pa|ma|parents?)|"
+    r"friends?|colleagues?|neighbou?rs?|wife|husband|spouse|son|daughter|family|relatives?|he|she|they|his|her|their)\b"
+)
+
+AGE_THRESHOLD = re.compile(r"\b(below|under|less than)\s+(\d+)|\b(above|over|more than)\s+(\d+)")
+
+# Ages / dates of birth stated in a message
+AGE_PATTERNS = [
+    re.compile(r"\b(\d{1,3})\s*(?:years?|yrs?)\s*old\b"),
+    re.compile(r"\bage(?:d)?\s*(?:is|:|=|-)?\s*(\d{1,3})\b"),
+    re.compile(r"\bi(?:'m| am)\s*(\d{1,2})\b(?!\s*(?:lakh|lac|lpa|k\b|l\b|cr|crore|thousand|rupees|rs|inr|%|years? of|yrs? of))"),
+]
+DOB_PATTERNS = [
+    (re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b"), ("y", "m", "d")),
+    (re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})\b"), ("d", "m", "y")),
+]
+
+
+def _age_from_dob(year, month, day, today):
+    try:
+        dob = datetime.date(year, month, day)
+    except ValueError:
+        return None
+    if dob > today:
+        return None
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+
+def extract_ages(text, today=None):
+    """Ages (in years) the user states for themselves in `text`, directly or as a date of birth."""
+    today = today or datetime.date.today()
+    ages = []
+    for pattern in AGE_PATTERNS:
+        ages.extend(int(m.group(1)) for m in pattern.finditer(text) if not _about_third_party(text, m))
+    for pattern, order in DOB_PATTERNS:
+        for m in pattern.finditer(text):
+            if _about_third_party(text, m):
+                continue
+            parts = dict(zip(order, (int(g) for g in m.groups())))
+            age = _age_from_dob(parts["y"], parts["m"], parts["d"], today)
+            if age is not None:
+                ages.append(age)
+    return [age for age in ages if age <= 120]
+
+
+def _clause_before(text, start):
+    """The text of the clause before position `start`."""
+    before = text[:start]
+    breaks = list(CLAUSE_BREAK.finditer(before))
+    return before[breaks[-1].end():] if breaks else before
+
+
+def _about_third_party(text, match):
+    # Text after the match never counts: "I have cancer and they are treating me" is the user's
+    before = _clause_before(text, match.start())
+    third = [m.start() for m in THIRD_PARTY.finditer(before)]
+    if not third:
+        return False
+    first = [m.start() for m in FIRST_PERSON.finditer(before)]
+    return max(third) > max(first, default=-1)
+
+
+def _condition_phrases(condition):
+    phrases = [condition]
+    for part in re.split(r"\s*/\s*", condition):
+        phrases.append(part)
+        # "Rock or ice climbing" -> "rock climbing", "ice climbing"
+        words = part.split(" or ")
+        if len(words) == 2 and " " in words[1]:
+            tail = words[1].split(" ", 1)[1]
+            phrases.extend([f"{words[0]} {tail}", words[1]])
+    return [re.escape(p.strip()) for p in phrases if p.strip()]
+
+
+class EligibilityRule:
+    """One compiled CSV row: an age threshold or a keyword pattern."""
+
+    __slots__ = ("category", "condition", "impact", "pattern", "negatable", "min_age", "max_age")
+
+    def __init__(self, category, condition, impact):
+        self.category = category
+        self.condition = condition
+        self.impact = impact
+        self.pattern = None
+        self.negatable = True
+        self.min_age = None
+        self.max_age = None
+
+        key = condition.lower()
+        threshold = AGE_THRESHOLD.search(key) if "age" in category.lower() else None
+        if threshold:
+            # "Below 18 years" -> eligible from 18; "Above 65" -> eligible up to 65
+            if threshold.group(2):
+                self.min_age = int(threshold.group(2))
+            else:
+                self.max_age = int(threshold.group(4))
+            return
+
+        phrases = SYNONYMS.get(key) or _condition_phrases(key)
+        self.pattern = re.compile(r"\b(" + "|".join(phrases) + r")\b")
+        self.negatable = key not in NEGATION_PHRASED
+
+    def check_age(self, age):
+        if self.min_age is not None and age < self.min_age:
+            return True
+        return self.max_age is not None and age > self.max_age
+
+    def find(self, text):
+        """The matched phrase in (lowercase) `text`, or None."""
+        if self.pattern is None:
+            return None
+        for m in self.pattern.finditer(text):
+            if _about_third_party(text, m):
+                continue
+            if self.negatable and NEGATION.search(_clause_before(text, m.start())):
+                continue
+            return m.group(0)
+        return None
+
+    def verdict(self, evidence):
+        return {"category": self.category, "condition": self.condition, "impact": self.impact, "evidence": evidence}
+
+
+class EligibilityScreener:
+    """Rule matcher compiled from the eligibility CSV rows."""
+
+    def __init__(self, rows):
+        self.rules = []
+        for row in rows:
+            category = (row.get("Category") or "").strip()
+            condition = (row.get("Condition / Profile") or "").strip()
+            if not category or not condition:
+                continue
+            impact = (row.get("Impact on Eligibility") or "").strip() or "Review needed"
+            self.rules.append(EligibilityRule(category, condition, impact))
+
+    @classmethod
+    def from_csv(cls, path=DEFAULT_ELIGIBILITY_CSV):
+        if not os.path.exists(path):
+            logger.error("❌ Eligibility CSV NOT FOUND at: %s", path)
+            return cls([])
+        with open(path, newline="", encoding="utf-8") as f:
+            screener = cls(csv.DictReader(f))
+        logger.info("✅ Eligibility rules compiled (%d rules)", len(screener.rules))
+        return screener
+
+    def screen(self, message=None, profile=None):
+        """
+        Verdicts of every rule matched by the user message or the known profile slots:
+        [{"category", "condition", "impact", "evidence"}].
+        """
+        text = (message or "").lower()
+        profile = profile or {}
+        ages = extract_ages(text) if text else []
+        if isinstance(profile.get("age"), (int, float)):
+            ages.append(profile["age"])
+
+        verdicts = []
+        for rule in self.rules:
+            if rule.pattern is None:
+                matched_age = next((age for age in ages if rule.check_age(age)), None)
+                if matched_age is not None:
+                    verdicts.append(rule.verdict(f"age {matched_age}"))
+                continue
+
+            evidence = rule.find(text) if text else None
+            if evidence is None and rule.condition.lower() == "no stable income proof" and profile.get("income") == 0:
+                evidence = "income 0"
+            if evidence is not None:
+                verdicts.append(rule.verdict(evidence))
+        return verdicts
+
+    def prompt_context(self):
+        """Compact rule summary for the system prompt (conditions and their impact, grouped by category)."""
+        if not self.rules:
+            return "No eligibility data available."
+        grouped = {}
+        for rule in self.rules:
+            grouped.setdefault(rule.category, []).append(f"{rule.condition} ({rule.impact})")
+        lines = [f"- **{category}**: {', '.join(conditions)}" for category, conditions in grouped.items()]
+        return "\n".join(lines)
+
+
+def format_verdicts(verdicts):
+    """Note appended to the user message sent to the model (not to the stored history)."""
+    lines = [f"- {v['category']}: '{v['condition']}' (user said: \"{v['evidence']}\") -> {v['impact']}" for v in verdicts]
+    return "[Eligibility pre-screen]\n" + "\n".join(lines)
@@ -0,0 +1,153 @@
+import re
+
+# Deterministic stand-in for the Gemini model, used by the offline benchmarks. It reads the
+# conversation of a GenerateContent request and scripts the reply a salesperson flow needs:
+# calculate_recommended_cover once age/DOB and income are known, calculate_insurance_plan
+# once gender is given, a summary after each tool result and a short follow-up question
+# otherwise. Replies are plain dicts in the Gemini REST shape ({"text": ...} or
+# {"functionCall": {"name": ..., "args": {...}}}) so they can be served in-process (see
+# install) or over HTTP.
+
+# Multi-turn flow mirroring test_salesperson_flow.py
+SALESPERSON_FLOW = [
+    "Hi, I am looking for insurance.",
+    "I am 30 years old and earn 20 Lakhs.",
+    "I am a Software Engineer.",
+    "No, I don't smoke.",
+    "Male.",
+]
+
+AGE_PATTERN = re.compile(r"\b(\d{2})\s*(?:years?|yrs?)\b", re.IGNORECASE)
+DOB_PATTERN = re.compile(r"\b(\d{4}-\d{2}-\d{2}|\d{2}-\d{2}-\d{4})\b")
+INCOME_PATTERN = re.compile(r"\b(\d+(?:\.\d+)?)\s*(lakhs?|lacs?|l\b|crores?|cr\b)", re.IGNORECASE)
+GENDER_PATTERN = re.compile(r"\b(male|female)\b", re.IGNORECASE)
+NON_SMOKER_PATTERN = re.compile(r"\b(don'?t|do not|never|non)[\s-]*smok", re.IGNORECASE)
+SMOKER_PATTERN = re.compile(r"\bsmok", re.IGNORECASE)
+
+
+def extract_profile(user_texts):
+    """Profile slots stated in the user's messages (later messages win)."""
+    profile = {}
+    for text in user_texts:
+        if match := AGE_PATTERN.search(text):
+            profile["age"] = int(match.group(1))
+        if match := DOB_PATTERN.search(text):
+            profile["dob"] = match.group(1)
+        if match := INCOME_PATTERN.search(text):
+            unit = match.group(2).lower()
+            profile["income"] = float(match.group(1)) * (10000000 if unit.startswith("c") else 100000)
+        if match := GENDER_PATTERN.search(text):
+            profile["gender"] = match.group(1).capitalize()
+        if NON_SMOKER_PATTERN.search(text):
+            profile["smoker"] = False
+        elif SMOKER_PATTERN.search(text):
+            profile["smoker"] = True
+    return profile
+
+
+class ScriptedGemini:
+    """
+    Scripted replies for a conversation. `reply_words` sets the length of the text answers
+    (generation cost on the client side scales with it).
+    """
+
+    def __init__(self, reply_words=60):
+        self.reply_words = reply_words
+
+    def _text(self, lead):
+        filler = " ".join(["insurance"] * max(0, self.reply_words - len(lead.split())))
+        return {"text": f"{lead} {filler}".strip()}
+
+    def reply(self, turns):
+        """
+        Next model part for `turns`: [(role, [part dict, ...]), ...] in request order, where
+        text parts are {"text": ...} and tool results {"functionResponse": {"name": ...}}.
+        """
+        role, parts = turns[-1]
+        last = parts[-1] if parts else {}
+        if "functionResponse" in last:
+            name = last["functionResponse"].get("name")
+            return self._text(f"Here is the result of {name} for you 🛡️.")
+
+        user_texts = [p["text"] for r, ps in turns if r == "user" for p in ps if "text" in p]
+        message = user_texts[-1] if user_texts else ""
+        profile = extract_profile(user_texts)
+
+        if GENDER_PATTERN.search(message) and "income" in profile:
+            return {"functionCall": {"name": "calculate_insurance_plan", "args": {
+                "age": profile.get("age", 30),
+                "income": profile["income"],
+                "smoker": profile.get("smoker", False),
+                "gender": profile["gender"],
+            }}}
+        if INCOME_PATTERN.search(message) and ("age" in profile or "dob" in profile):
+            args = {"income": profile["income"]}
+            if "dob" in profile:
+                args["dob"] = profile["dob"]
+            else:
+                args["age_override"] = profile["age"]
+            return {"functionCall": {"name": "calculate_recommended_cover", "args": args}}
+        return self._text("Thanks! Could you tell me a little more about yourself? 😊")
+
+
+# --- In-process client (google.generativeai) ---
+
+def _request_turns(request):
+    turns = []
+    for content in request.contents:
+        parts = []
+        for part in content.parts:
+            if "function_response" in part:
+                parts.append({"functionResponse": {"name": part.function_response.name}})
+            elif "function_call" in part:
+                parts.append({"functionCall": {"name": part.function_call.name}})
+            else:
+                parts.append({"text": part.text})
+        turns.append((content.role, parts))
+    return turns
+
+
+class FakeGenerativeClient:
+    """Replaces the SDK's GenerativeService client; answers with a ScriptedGemini."""
+
+    def __init__(self, script=None):
+        from google.generativeai import protos
+        self._protos = protos
+        self.script = script or ScriptedGemini()
+        self.calls = 0
+
+    def _response(self, part):
+        protos = self._protos
+        if "functionCall" in part:
+            call = part["functionCall"]
+            proto_part = protos.Part(function_call=protos.FunctionCall(name=call["name"], args=call["args"]))
+        else:
+            proto_part = protos.Part(text=part["text"])
+        return protos.GenerateContentResponse(candidates=[protos.Candidate(
+            content=protos.Content(role="model", parts=[proto_part]), finish_reason=1,
+        )])
+
+    def generate_content(self, request, **kwargs):
+        self.calls += 1
+        return self._response(self.script.reply(_request_turns(request)))
+
+    def stream_generate_content(self, request, **kwargs):
+        self.calls += 1
+        part = self.script.reply(_request_turns(request))
+        if "text" not in part:
+            yield self._response(part)
+            return
+        words = part["text"].split(" ")
+        for i, word in enumerate(words):
+            yield self._response({"text": word + (" " if i < len(words) - 1 else "")})
+
+
+def install(script=None):
+    """
+    Routes the google.generativeai SDK to a FakeGenerativeClient (call after
+    genai.configure, which resets the client). Returns the client.
+    """
+    from google.generativeai import client as genai_client
+    fake = FakeGenerativeClient(script)
+    genai_client._client_manager.clients["generative"] = fake
+    return fake
@@ -0,0 +1,81 @@
+import os
+import sys
+
+# Multi-worker deployment: gunicorn -c gunicorn.conf.py main:app (from backend/)
+#
+# The master builds the engine's data snapshot once before forking, then switches the
+# workers to ENGINE_SNAPSHOT=readonly: each worker maps that snapshot instead of parsing the
+# data files, so the engine's arrays are shared read-only through the page cache and every
+# worker serves the same data version. The master also watches the data files and rewrites
+# the snapshot when they change; the workers' own watchers pick up the new snapshot.
+# The engine's NumPy arrays are shared; its dicts (product_data, policy_index) are unpickled
+# from the mapped snapshot by each worker, so they are per-worker copies.
+#
+# Sessions must be visible to every worker: with more than one worker SESSION_BACKEND has to
+# be file or sqlite, and the workers read the stored session on every turn (SESSION_SHARED).
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+# The app itself is imported per worker (its background threads do not survive a fork);
+# only the engine modules are preloaded in the master (see on_starting)
+preload_app = False
+
+
+def _snapshot_path():
+    from data_snapshot import DEFAULT_SNAPSHOT_PATH
+    return os.getenv("ENGINE_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+
+
+def on_starting(server):
+    # 0. Without affinity, any worker may get any turn of a conversation
+    if server.cfg.workers > 1:
+        if os.getenv("SESSION_BACKEND", "memory").lower() not in ("file", "sqlite"):
+            raise RuntimeError(
+                f"{server.cfg.workers} workers need SESSION_BACKEND=file or sqlite: in-memory sessions "
+                "are private to one worker (or run a single worker)"
+            )
+        os.environ["SESSION_SHARED"] = "true"
+
+    # 1. Build (or reuse) the snapshot from the data files. Importing the engine and SDK
+    # modules here also means forked workers start with them loaded (and share their pages)
+    os.environ["ENGINE_SNAPSHOT_PATH"] = _snapshot_path()
+    os.environ["ENGINE_SNAPSHOT"] = "true"
+    from log_config import configure_logging
+    # The master logs synchronously: a queue listener thread would not survive the fork
+    # (workers configure their own logging when they import main)
+    configure_logging(use_queue=False)
+    import fastapi  # noqa: F401
+    import google.generativeai  # noqa: F401
+    from logic import InsuranceEngine
+    engine = InsuranceEngine()
+    problem = engine.validate()
+    if problem is not None:
+        raise RuntimeError(f"Engine data is not usable: {problem}")
+
+    # 2. Workers only read the master's snapshot
+    os.environ["ENGINE_SNAPSHOT"] = "readonly"
+    server.log.info("Engine snapshot %s ready at %s", engine.data_version, os.environ["ENGINE_SNAPSHOT_PATH"])
+
+
+def when_ready(server):
+    interval = float(os.getenv("DATA_RELOAD_INTERVAL_SECONDS", "5"))
+    if interval <= 0:
+        return
+    from data_watcher import DataWatcher
+    from logic import InsuranceEngine, SOURCE_PATHS
+
+    def rebuild():
+        # Rejected data leaves the current snapshot (and the workers) untouched
+        engine = InsuranceEngine(snapshot="false")
+        problem = engine.validate()
+        if problem is not None:
+            server.log.error("Reloaded data rejected: %s", problem)
+            return
+        engine.write_snapshot(os.environ["ENGINE_SNAPSHOT_PATH"])
+        server.log.info("Engine snapshot rebuilt: data version %s", engine.data_version)
+
+    DataWatcher(SOURCE_PATHS, rebuild, interval=interval).start()
@@ -0,0 +1,118 @@
+import re
+
+# Local fast path for well-defined conversation steps. When the bot has just asked for the
+# cover type (Discovery Step 4) or policy type (Step 5) and the user is unsure, the answer is
+# the fixed explanation from SYSTEM_PROMPT, so it is served from a pre-rendered template
+# instead of a model round trip. Anything else falls through to Gemini.
+
+COVER_TYPE_INTENT = "explain_cover_types"
+POLICY_TYPE_INTENT = "explain_policy_types"
+
+COVER_TYPES_TEMPLATE = """No worries! 😊 Choosing the right **type of cover** 🛡️ is an important decision, so here are your options:
+
+1. **Flat Cover (Level Term) ➡️:** The **sum assured** remains **constant** throughout the policy term. Simple and **affordable**.
+
+2. **Increasing Cover 📈:** The **sum assured increases** by a fixed percentage (e.g., **5-10%**) every year to **combat inflation**. Great for **young professionals**.
+
+3. **Decreasing Cover 📉:** The **sum assured reduces** over time. Ideal for covering **loans** like **home/car loans**.
+
+4. **Return of Premium (ROP) ↩️:** If you **survive the term**, you get back **all premiums paid** (excluding taxes). Costs more but offers a **"money-back" guarantee** 💰.
+
+5. **Zero Cost Term Insurance 0️⃣:** A smart option where you can **surrender the policy** at a specific age (e.g., **60/65**) and **get premiums back**. **Low cost + exit option**.
+
+👉 **What type of cover** are you looking for?"""
+
+POLICY_TYPES_TEMPLATE = """No problem! 😊 Here are the main **types of term life policy** 📑:
+
+1. **Pure Term Life 🛡️:** **Standard protection**. Pay premium -> Family gets **payout** if death occurs. **No survival returns**.
+
+2. **Return of Premium (ROP) 💰:** Get your **premiums back** if you **survive the term**.
+
+3. **TULIP (Unit-Linked) 📊:** **Hybrid plan**. **Life cover** + **Market investment** (wealth creation).
+
+4. **Joint Term Plan 👥:** Covers **husband and wife** in a **single policy**. Payout on **first death** (or both).
+
+5. **Increased Sum Assured ➕:** **Boosts coverage** at key life stages (**marriage, childbirth**) **without new medicals**.
+
+👉 **Which type of term life policy** are you looking for?"""
+
+# What the bot asked last
+COVER_QUESTION = re.compile(r"(type|kind)s? of cover|cover type")
+POLICY_QUESTION = re.compile(r"(type|kind)s? of (term )?(life )?(insurance )?polic(y|ies)|policy type")
+
+# The question the bot's message ends with (an "(a, b, etc.)" hint, emoji or markdown may follow the "?")
+TRAILING_QUESTION = re.compile(r"([^\n.!?]*\?)[^\w?(]*(\([^()]*\))?[^\w?]*$")
+
+# The user is unsure / wants the options explained
+UNSURE_ANSWER = re.compile(
+    r"\b(i\s*(really\s*)?(do\s*n[o']?t|dont|do not)\s*know|idk|not sure|unsure|no idea|confused|"
+    r"what are (the|my)?\s*(options|choices|they)|help me (choose|decide)|what do you mean)\b"
+)
+
+# A cover or policy type named in the answer is information for the model, not a request
+# for the option list
+OPTION_MENTION = re.compile(
+    r"\b(flat|level|increas\w*|decreas\w*|return of premium|rop|money[\s-]?back|zero[\s-]?cost|"
+    r"pure|standard|t?ulip|unit[\s-]?linked|joint)\b"
+)
+
+# Explicit questions about the options, whatever was asked before
+EXPLICIT_COVER_ASK = re.compile(r"\b(what|which) (are|is) (the )?(different )?(types?|kinds?|options) of cover")
+EXPLICIT_POLICY_ASK = re.compile(r"\b(what|which) (are|is) (the )?(different )?(types?|kinds?|options) of (term )?(life )?(insurance )?(polic(y|ies)|plans?)")
+
+# Longer messages usually carry information the model has to process
+MAX_FAST_PATH_LENGTH = 80
+
+
+def product_mention_pattern(names):
+    """
+    Regex matching insurer or product names (and their insurers' first words, e.g. "hdfc"),
+    passed to route_intent so questions about a product go to the model. None without names.
+    """
+    terms = set()
+    for name, insurer in names:
+        name = " ".join(str(name).lower().split())
+        if name:
+            terms.add(name)
+            if insurer:
+                terms.add(name.split()[0])
+    if not terms:
+        return None
+    return re.compile(r"(?<!\w)(" + "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)) + r")(?!\w)")
+
+
+def route_intent(last_bot_message, user_message, product_mention=None):
+    """
+    Returns COVER_TYPE_INTENT / POLICY_TYPE_INTENT if the turn can be answered from a
+    template, otherwise None. `product_mention` is a product_mention_pattern().
+    """
+    text = (user_message or "").strip().lower()
+    if not text or len(text) > MAX_FAST_PATH_LENGTH:
+        return None
+    if OPTION_MENTION.search(text) or (product_mention is not None and product_mention.search(text)):
+        return None
+
+    if EXPLICIT_POLICY_ASK.search(text):
+        return POLICY_TYPE_INTENT
+    if EXPLICIT_COVER_ASK.search(text):
+        return COVER_TYPE_INTENT
+
+    if not last_bot_message or not UNSURE_ANSWER.search(text):
+        return None
+
+    # Only an answer to the question the bot's message ends with; the one it asks decides the step
+    question = TRAILING_QUESTION.search(last_bot_message.strip().lower())
+    if question is None:
+        return None
+    asked = question.group(1)
+    cover_asked = [m.start() for m in COVER_QUESTION.finditer(asked)]
+    policy_asked = [m.start() for m in POLICY_QUESTION.finditer(asked)]
+    if not cover_asked and not policy_asked:
+        return None
+    if max(policy_asked, default=-1) > max(cover_asked, default=-1):
+        return POLICY_TYPE_INTENT
+    return COVER_TYPE_INTENT
+
+
+def render_intent(intent):
+    return COVER_TYPES_TEMPLATE if intent == COVER_TYPE_INTENT else POLICY_TYPES_TEMPLATE
@@ -0,0 +1,184 @@
+"""
+Concurrent load test for /chat.
+
+Each virtual user replays the salesperson flow (the turns of test_salesperson_flow.py, see
+fake_gemini.SALESPERSON_FLOW) as one session, over and over, until the requested number of
+flows or the duration is reached. Reports throughput and latency percentiles per turn, and
+the server's model status (fallbacks / open circuits) at the end.
+
+Run it against a backend pointed at mock_gemini.py (see README) so no API quota is used.
+
+Usage:
+    python load_test.py [--url http://127.0.0.1:8000] [--concurrency 16]
+        [--flows 200 | --duration 60] [--stream] [--mock-url http://127.0.0.1:9000] [--json results.json]
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from fake_gemini import SALESPERSON_FLOW
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class LoadTest:
+    def __init__(self, url, concurrency, flows=None, duration=None, stream=False, timeout=120):
+        self.url = url.rstrip("/")
+        self.concurrency = concurrency
+        self.flows = flows
+        self.duration = duration
+        self.stream = stream
+        self.timeout = timeout
+
+        self.turns = [] # (turn index, latency seconds, ok)
+        self.flow_latencies = []
+        self.errors = {} # error text -> count
+        self._started_flows = 0
+        self._lock = threading.Lock()
+
+    def _claim_flow(self, deadline):
+        with self._lock:
+            if self.flows is not None and self._started_flows >= self.flows:
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._started_flows += 1
+            return True
+
+    def _send(self, http, message, session_id):
+        payload = {"message": message, "session_id": session_id}
+        if not self.stream:
+            body = http.post(f"{self.url}/chat", json=payload, timeout=self.timeout).json()
+            return body.get("session_id"), body.get("error"), bool(body.get("recommendations"))
+
+        # /chat/stream: read the SSE stream to the end
+        session, error, recommended, event = session_id, None, False, None
+        with http.post(f"{self.url}/chat/stream", json=payload, timeout=self.timeout, stream=True) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if event == "recommendations":
+                        recommended = True
+                    elif event in ("done", "error"):
+                        session = data.get("session_id") or session
+                        error = data.get("error")
+        return session, error, recommended
+
+    def _record_error(self, error):
+        key = str(error)[:120]
+        with self._lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def _user(self, deadline):
+        http = requests.Session()
+        while self._claim_flow(deadline):
+            session_id = None
+            flow_started = time.perf_counter()
+            flow_ok = True
+            for i, message in enumerate(SALESPERSON_FLOW):
+                started = time.perf_counter()
+                try:
+                    session_id, error, _ = self._send(http, message, session_id)
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                latency = time.perf_counter() - started
+                with self._lock:
+                    self.turns.append((i, latency, error is None))
+                if error is not None:
+                    self._record_error(error)
+                    flow_ok = False
+                    break
+            if flow_ok:
+                with self._lock:
+                    self.flow_latencies.append(time.perf_counter() - flow_started)
+
+    def run(self):
+        deadline = time.monotonic() + self.duration if self.duration else None
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for _ in range(self.concurrency):
+                pool.submit(self._user, deadline)
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        ok = [latency for _, latency, success in self.turns if success]
+
+        def summary(latencies):
+            return {
+                "count": len(latencies),
+                **{f"p{q}_ms": round(percentile(latencies, q) * 1000, 1) if latencies else None for q in (50, 90, 95, 99)},
+            }
+
+        return {
+            "url": self.url,
+            "endpoint": "/chat/stream" if self.stream else "/chat",
+            "concurrency": self.concurrency,
+            "elapsed_s": round(elapsed, 2),
+            "turns": len(self.turns),
+            "failed_turns": len(self.turns) - len(ok),
+            "completed_flows": len(self.flow_latencies),
+            "turns_per_s": round(len(ok) / elapsed, 2) if elapsed else None,
+            "flows_per_s": round(len(self.flow_latencies) / elapsed, 3) if elapsed else None,
+            "turn_latency": summary(ok),
+            "turn_latency_by_step": {
+                f"{i + 1}: {message}": summary([latency for step, latency, success in self.turns if step == i and success])
+                for i, message in enumerate(SALESPERSON_FLOW)
+            },
+            "flow_latency": summary(self.flow_latencies),
+            "errors": self.errors,
+        }
+
+
+def fetch_json(url):
+    try:
+        return requests.get(url, timeout=10).json()
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent /chat load test")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Backend base URL")
+    parser.add_argument("--concurrency", type=int, default=16, help="Virtual users")
+    parser.add_argument("--flows", type=int, help="Total flows to run (default 10 per user)")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of a fixed number of flows")
+    parser.add_argument("--stream", action="store_true", help="Use /chat/stream")
+    parser.add_argument("--mock-url", help="mock_gemini.py base URL, to include its request stats")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args(argv)
+
+    flows = args.flows if args.flows or args.duration else args.concurrency * 10
+    test = LoadTest(args.url, args.concurrency, flows=flows, duration=args.duration, stream=args.stream)
+    print(f"🚀 {args.concurrency} users replaying {len(SALESPERSON_FLOW)}-turn flows against {test.url}...")
+    report = test.report(test.run())
+    report["model_status"] = fetch_json(f"{test.url}/status/models")
+    if args.mock_url:
+        report["mock_stats"] = fetch_json(f"{args.mock_url.rstrip('/')}/stats")
+
+    latency = report["turn_latency"]
+    print(f"✅ {report['completed_flows']} flows, {report['turns']} turns ({report['failed_turns']} failed) in {report['elapsed_s']}s")
+    print(f"📈 {report['turns_per_s']} turns/s, {report['flows_per_s']} flows/s")
+    print(f"⏱️ turn latency p50 {latency['p50_ms']} ms | p90 {latency['p90_ms']} ms | p95 {latency['p95_ms']} ms | p99 {latency['p99_ms']} ms")
+    for step, summary in report["turn_latency_by_step"].items():
+        print(f"   {step:<45} p50 {summary['p50_ms']} ms | p95 {summary['p95_ms']} ms")
+    for error, count in report["errors"].items():
+        print(f"❌ {count} x {error}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
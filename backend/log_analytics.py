@@ -0,0 +1,369 @@
+"""
+Conversation-log analytics.
+
+Incrementally ingests the legacy banner log (conversation_logs.txt) and the structured JSONL
+logs (logs/conversations*.jsonl, including rotated .gz files) into a small SQLite index, then
+answers funnel / latency / volume questions from it.
+
+Usage:
+    python log_analytics.py ingest [paths...]
+    python log_analytics.py funnel --since 7d
+    python log_analytics.py latency --since 24h
+    python log_analytics.py volume --by day --since 30d
+
+Queries ingest new log bytes first (skip with --no-ingest). Each file's read offset is kept in
+the index, so re-runs only parse what was appended since; records are keyed by a content hash,
+so a file seen again after rotation is not counted twice.
+"""
+import argparse
+import datetime
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = os.path.join(BASE_PATH, "logs", "analytics.sqlite3")
+DEFAULT_SOURCES = [
+    os.path.join(BASE_PATH, "conversation_logs.txt"),
+    os.path.join(BASE_PATH, "logs", "conversations*.jsonl*"),
+]
+
+# Conversation phases (a session's funnel stage is the highest phase of its turns)
+PHASE_CHAT = 0
+PHASE_COVER = 1 # Recommended cover calculated
+PHASE_PLANS = 2 # Plan recommendations shown
+
+# Banner logs carry no session ids: turns further apart than this start a new session
+LEGACY_SESSION_GAP = 30 * 60
+
+# Banner logs carry no tool calls either, so the phase is read off the bot's wording
+LEGACY_COVER_HINTS = re.compile(r"sum assured explained|recommended cover|recommend a cover", re.IGNORECASE)
+LEGACY_PLAN_HINTS = re.compile(r"premium estimate|estimated premium|claim settlement ratio|csr\b|top \d+ (plans|recommendations)", re.IGNORECASE)
+
+SEPARATOR = re.compile(r"^(?:=|-){20,}[ \t\r]*$", re.MULTILINE)
+SEPARATOR_BYTES = re.compile(rb"^(?:=|-){20,}[ \t\r]*$", re.MULTILINE)
+BANNER_ENTRY = re.compile(r"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]\s*\nUSER: (.*?)\n+BOT: (.*)$", re.DOTALL)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    legacy_session TEXT,
+    legacy_last_ts REAL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id TEXT PRIMARY KEY,
+    ts REAL NOT NULL,
+    session_id TEXT,
+    source TEXT,
+    model TEXT,
+    latency_ms REAL,
+    tool_calls INTEGER NOT NULL DEFAULT 0,
+    phase INTEGER NOT NULL DEFAULT 0,
+    error INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS turns_ts ON turns (ts);
+CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, phase);
+CREATE INDEX IF NOT EXISTS turns_model ON turns (model, ts);
+"""
+
+
+def connect(db_path):
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# --- PARSING ---
+
+def _record_id(raw):
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def parse_jsonl_record(line):
+    """One structured log line (see conversation_logger.py) -> turn row, or None."""
+    try:
+        record = json.loads(line)
+        ts = datetime.datetime.fromisoformat(record["timestamp"]).timestamp()
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    tools = [call.get("tool") for call in record.get("tool_calls") or []]
+    if record.get("recommendations"):
+        phase = PHASE_PLANS
+    elif "calculate_recommended_cover" in tools:
+        phase = PHASE_COVER
+    else:
+        phase = PHASE_CHAT
+    return {
+        "id": _record_id(line),
+        "ts": ts,
+        "session_id": record.get("session_id"),
+        "source": record.get("source"),
+        "model": record.get("model"),
+        "latency_ms": record.get("latency_ms"),
+        "tool_calls": len(tools),
+        "phase": phase,
+        "error": 1 if record.get("error") else 0,
+    }
+
+
+def parse_banner_block(block):
+    """One banner-separated entry of conversation_logs.txt -> turn row (without session), or None."""
+    match = BANNER_ENTRY.match(block.strip())
+    if not match:
+        return None
+    timestamp, _, bot = match.groups()
+    if LEGACY_PLAN_HINTS.search(bot):
+        phase = PHASE_PLANS
+    elif LEGACY_COVER_HINTS.search(bot):
+        phase = PHASE_COVER
+    else:
+        phase = PHASE_CHAT
+    return {
+        "id": _record_id(block.strip()),
+        "ts": datetime.datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timestamp(),
+        "session_id": None,
+        "source": "legacy",
+        "model": None,
+        "latency_ms": None,
+        "tool_calls": 0,
+        "phase": phase,
+        "error": 1 if bot.startswith("I apologize, but I'm facing a technical issue") or bot.startswith("⚠️") else 0,
+    }
+
+
+# --- INGESTION ---
+
+def _read_from(path, offset):
+    if path.endswith(".gz"):
+        # Rotated files are immutable: read once, whole
+        if offset > 0:
+            return b""
+        with gzip.open(path, "rb") as f:
+            return f.read()
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read()
+
+
+def _complete_part(data, is_jsonl):
+    """Length of `data` made of complete records (a record still being written is left for later)."""
+    if is_jsonl:
+        return data.rfind(b"\n") + 1
+    # Banner entries are complete once followed by a separator line
+    last = None
+    for last in SEPARATOR_BYTES.finditer(data):
+        pass
+    return last.end() if last is not None else 0
+
+
+def ingest_file(conn, path):
+    """Parses the bytes of `path` not seen yet. Returns the number of new turns."""
+    stat = os.stat(path)
+    row = conn.execute("SELECT inode, offset, legacy_session, legacy_last_ts FROM files WHERE path = ?", (path,)).fetchone()
+    offset, legacy_session, legacy_last_ts = 0, None, None
+    if row is not None:
+        inode, offset, legacy_session, legacy_last_ts = row
+        # Replaced (rotated) or truncated since the last run: start over
+        if inode != stat.st_ino or (not path.endswith(".gz") and stat.st_size < offset):
+            offset = 0
+
+    data = _read_from(path, offset)
+    is_jsonl = ".jsonl" in os.path.basename(path)
+    consumed = _complete_part(data, is_jsonl) if not path.endswith(".gz") else len(data)
+    text = data[:consumed].decode("utf-8", errors="replace")
+
+    rows = []
+    if is_jsonl:
+        for line in text.splitlines():
+            if line.strip():
+                parsed = parse_jsonl_record(line)
+                if parsed:
+                    rows.append(parsed)
+    else:
+        for block in SEPARATOR.split(text):
+            parsed = parse_banner_block(block) if block.strip() else None
+            if parsed is None:
+                continue
+            # Sessionize by time gap
+            if legacy_session is None or legacy_last_ts is None or parsed["ts"] - legacy_last_ts > LEGACY_SESSION_GAP:
+                legacy_session = f"legacy-{parsed['id'][:12]}"
+            legacy_last_ts = parsed["ts"]
+            parsed["session_id"] = legacy_session
+            rows.append(parsed)
+
+    before = conn.total_changes
+    conn.executemany(
+        "INSERT OR IGNORE INTO turns (id, ts, session_id, source, model, latency_ms, tool_calls, phase, error) "
+        "VALUES (:id, :ts, :session_id, :source, :model, :latency_ms, :tool_calls, :phase, :error)",
+        rows,
+    )
+    new_rows = conn.total_changes - before
+    new_offset = offset + consumed if not path.endswith(".gz") else max(1, stat.st_size)
+    conn.execute(
+        "INSERT OR REPLACE INTO files (path, inode, offset, legacy_session, legacy_last_ts) VALUES (?, ?, ?, ?, ?)",
+        (path, stat.st_ino, new_offset, legacy_session, legacy_last_ts),
+    )
+    conn.commit()
+    return new_rows
+
+
+def expand_sources(sources):
+    paths = []
+    for source in sources:
+        matches = sorted(glob.glob(source)) if glob.has_magic(source) else [source]
+        paths.extend(p for p in matches if os.path.isfile(p))
+    return paths
+
+
+def ingest(conn, sources):
+    total = 0
+    for path in expand_sources(sources):
+        total += ingest_file(conn, os.path.abspath(path))
+    return total
+
+
+# --- QUERIES ---
+
+def parse_since(value):
+    """'7d' / '24h' / '30m' / 'YYYY-MM-DD' -> epoch seconds (None for everything)."""
+    if not value:
+        return None
+    match = re.fullmatch(r"(\d+)([dhm])", value)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        return time.time() - amount * {"d": 86400, "h": 3600, "m": 60}[unit]
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def _since_clause(since):
+    return ("WHERE ts >= ?", (since,)) if since is not None else ("", ())
+
+
+def funnel(conn, since=None):
+    where, params = _since_clause(since)
+    rows = conn.execute(
+        f"SELECT phase, COUNT(*) FROM (SELECT session_id, MAX(phase) AS phase FROM turns {where} GROUP BY session_id) GROUP BY phase",
+        params,
+    ).fetchall()
+    by_phase = dict(rows)
+    sessions = sum(by_phase.values())
+    reached_cover = sum(n for phase, n in by_phase.items() if phase >= PHASE_COVER)
+    reached_plans = by_phase.get(PHASE_PLANS, 0)
+    return [
+        {"stage": "sessions", "sessions": sessions, "share": 1.0 if sessions else 0.0},
+        {"stage": "cover_calculated", "sessions": reached_cover, "share": round(reached_cover / sessions, 3) if sessions else 0.0},
+        {"stage": "plans_recommended", "sessions": reached_plans, "share": round(reached_plans / sessions, 3) if sessions else 0.0},
+    ]
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def latency(conn, since=None):
+    where, params = _since_clause(since)
+    where = f"{where} AND latency_ms IS NOT NULL" if where else "WHERE latency_ms IS NOT NULL"
+    per_model = {}
+    for model, value in conn.execute(f"SELECT COALESCE(model, source), latency_ms FROM turns {where} ORDER BY latency_ms", params):
+        per_model.setdefault(model, []).append(value)
+    return [
+        {
+            "model": model,
+            "turns": len(values),
+            "p50_ms": _percentile(values, 50),
+            "p90_ms": _percentile(values, 90),
+            "p99_ms": _percentile(values, 99),
+        }
+        for model, values in sorted(per_model.items(), key=lambda item: -len(item[1]))
+    ]
+
+
+VOLUME_KEYS = {
+    "day": "strftime('%Y-%m-%d', ts, 'unixepoch', 'localtime')",
+    "hour": "strftime('%Y-%m-%d %H:00', ts, 'unixepoch', 'localtime')",
+    "model": "COALESCE(model, '-')",
+    "source": "COALESCE(source, '-')",
+}
+
+
+def volume(conn, since=None, by="day"):
+    where, params = _since_clause(since)
+    key = VOLUME_KEYS[by]
+    rows = conn.execute(
+        f"SELECT {key} AS bucket, COUNT(*), COUNT(DISTINCT session_id), SUM(error) FROM turns {where} GROUP BY bucket ORDER BY bucket",
+        params,
+    ).fetchall()
+    return [{by: bucket, "turns": turns, "sessions": sessions, "errors": errors} for bucket, turns, sessions, errors in rows]
+
+
+# --- CLI ---
+
+def print_table(rows):
+    if not rows:
+        print("(no data)")
+        return
+    columns = list(rows[0].keys())
+    cells = [[("-" if row[c] is None else str(row[c])) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(r, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conversation log analytics")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite index path")
+    parser.add_argument("--no-ingest", action="store_true", help="Query the index as is")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest_cmd = sub.add_parser("ingest", help="Index new log bytes")
+    ingest_cmd.add_argument("sources", nargs="*", help="Log files or globs (default: banner log + JSONL logs)")
+
+    for name in ("funnel", "latency", "volume"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--since", help="e.g. 7d, 24h, 30m or YYYY-MM-DD")
+        cmd.add_argument("--sources", nargs="*", default=None)
+        if name == "volume":
+            cmd.add_argument("--by", choices=sorted(VOLUME_KEYS), default="day")
+
+    args = parser.parse_args(argv)
+    conn = connect(args.db)
+
+    started = time.perf_counter()
+    if args.command == "ingest" or not args.no_ingest:
+        new_rows = ingest(conn, args.sources or DEFAULT_SOURCES)
+        print(f"📥 Ingested {new_rows} new turns in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    if args.command == "ingest":
+        return
+
+    started = time.perf_counter()
+    since = parse_since(args.since)
+    if args.command == "funnel":
+        rows = funnel(conn, since)
+    elif args.command == "latency":
+        rows = latency(conn, since)
+    else:
+        rows = volume(conn, since, args.by)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_table(rows)
+    print(f"⏱️ Query took {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# Logging setup for the backend. Modules log through `logging.getLogger(__name__)` with
+# %-style arguments, so a message below the configured level costs one level check and is
+# never formatted. Per-candidate engine lines and anything carrying user input (messages,
+# profiles) are logged at DEBUG only.
+#
+# With LOG_QUEUE=true records are handed to a QueueHandler and written by a listener thread,
+# so request threads never block on stdout.
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s"
+
+_listener = None
+_handler = None # Root handler installed by configure_logging
+_configured_pid = None
+
+
+def _stop_listener():
+    if _listener is not None and _configured_pid == os.getpid():
+        _listener.stop()
+
+
+def configure_logging(level=None, use_queue=None):
+    """
+    Configures the root logger from LOG_LEVEL (default INFO) and LOG_QUEUE (default false).
+    Safe to call more than once; only the first call in a process installs handlers. A forked
+    child (e.g. a gunicorn worker) replaces the handler it inherited, since the parent's
+    listener thread does not exist in the child.
+    """
+    global _listener, _handler, _configured_pid
+    root = logging.getLogger()
+    if _configured_pid == os.getpid():
+        return
+    if _handler is not None:
+        # Inherited across a fork: nothing would drain the parent's queue here
+        root.removeHandler(_handler)
+        _listener = _handler = None
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    if use_queue is None:
+        use_queue = os.getenv("LOG_QUEUE", "false").lower() in ("1", "true", "yes")
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    if use_queue:
+        # Unbounded so logging never blocks or drops on the request path
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        handler = logging.handlers.QueueHandler(log_queue)
+
+    root.addHandler(handler)
+    root.setLevel(level)
+    _handler = handler
+    _configured_pid = os.getpid()
+
+
+atexit.register(_stop_listener)
@@ -1,100 +1,348 @@
-import pandas as pd
+import numpy as np
+import csv
+import heapq
 import json
+import logging
+import math
 import os
+import sys
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from data_snapshot import (
+    MODE_OFF, MODE_READONLY, MODE_READWRITE,
+    snapshot_mode, snapshot_path, source_hashes, data_version, load_snapshot, save_snapshot,
+)
+
+logger = logging.getLogger(__name__)
+
+# Normalised policy categories used to key the insurer -> policy index
+PURE_TERM = "pure_term"
+RETURN_OF_PREMIUM = "rop"
+ULIP = "ulip"
+POLICY_CATEGORIES = (PURE_TERM, RETURN_OF_PREMIUM, ULIP)
+
+
+def normalise_policy_type(policy_type):
+    """
+    Maps a free-text policy type preference (e.g. "TULIP", "Return of Premium")
+    onto one of the normalised POLICY_CATEGORIES.
+    """
+    pt_lower = str(policy_type).lower()
+    if "tulip" in pt_lower or "unit linked" in pt_lower:
+        return ULIP
+    if "return of premium" in pt_lower:
+        return RETURN_OF_PREMIUM
+    return PURE_TERM # Default to Pure Term
+
+
+def policy_matches_category(policy, category):
+    """
+    Returns True if a product config entry can serve the given normalised category.
+    """
+    meta = policy.get('metadata', {})
+    brochure_type = str(meta.get('brochure_type', '')).lower()
+    product_cat = str(meta.get('product_category', '')).lower()
+
+    if category == ULIP:
+        return "ulip" in brochure_type or "unit linked" in product_cat
+    if category == RETURN_OF_PREMIUM:
+        return "return of premium" in brochure_type or "savings" in product_cat
+    # Strict check: Must be a Term Insurance or generic Pure Risk product,
+    # ensuring we don't accidentally pick a ULIP/ROP if brochure_type is vague but category isn't
+    if "term insurance" in brochure_type or "pure risk" in product_cat:
+        return "unit linked" not in product_cat and "savings" not in product_cat
+    return False
+
+
+# --- PREMIUM / NEEDS MODEL CONSTANTS ---
+# Shared by the scalar methods and the vectorized batch path so both stay identical.
+
+BASE_PREMIUM_RATE = 12000
+
+# Company Tier Factors (Simulated Market Rates)
+# Tier 1 (Premium Brands) -> Higher Cost
+# Tier 2 (Value Brands) -> Medium Cost
+# Tier 3 (Budget Brands) -> Lower Cost
+COMPANY_FACTORS = {
+    "HDFC Life": 1.15,
+    "ICICI Prudential": 1.12,
+    "SBI Life": 1.10,
+    "Max Life": 1.05,
+    "Bajaj Allianz Life": 1.00, # Benchmark
+    "TATA AIA": 1.02,
+    "Kotak Life": 0.95,
+    "Pramerica Life": 0.90,
+    "Aditya Birla": 1.00
+}
+
+# Age-based income multipliers: (min_age, max_age, multiplier)
+AGE_MULTIPLIER_BANDS = (
+    (18, 35, 25),
+    (36, 40, 20),
+    (41, 45, 15),
+    (46, 50, 12),
+    (51, 55, 10),
+    (56, 60, 5),
+)
+DEFAULT_MULTIPLIER = 20 # Fallback
+
+
+def company_market_factor(company_name):
+    # Default to 1.0 if company not found
+    for key, val in COMPANY_FACTORS.items():
+        if key.lower() in str(company_name).lower():
+            return val
+    return 1.0
+
+
+@lru_cache(maxsize=256)
+def premium_type_factors(cover_type, policy_type):
+    """
+    Returns (cover_type_factor, policy_type_factor, forces_rop) for the free-text
+    cover and policy type preferences.
+    """
+    # Cover Type Factor
+    cover_type_factor = 1.0
+    ct_lower = str(cover_type).lower()
+    if "increasing" in ct_lower:
+        cover_type_factor = 1.2
+    elif "decreasing" in ct_lower:
+        cover_type_factor = 0.9
+
+    # Policy Type Factor
+    policy_type_factor = 1.0
+    forces_rop = False
+    pt_lower = str(policy_type).lower()
+
+    if "joint" in pt_lower:
+        policy_type_factor = 1.7 # Spouse cover cost
+    elif "tulip" in pt_lower or "unit linked" in pt_lower:
+        policy_type_factor = 1.5 # Investment component
+    elif "return of premium" in pt_lower:
+        forces_rop = True # Ensure ROP factor is applied if selected here
+    elif "increasing" in pt_lower or "increased" in pt_lower:
+        cover_type_factor = 1.2 # Ensure Increasing factor is applied
+
+    return cover_type_factor, policy_type_factor, forces_rop
+
+
+def is_missing(value):
+    """True for None / NaN / pandas NA cells (without importing pandas)."""
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return math.isnan(value)
+    return type(value).__name__ in ("NAType", "NaTType")
+
+
+def parse_number(value, default=0.0):
+    """'99.06%' / '5.81' -> float; unparseable values -> default."""
+    try:
+        return float(str(value).strip().rstrip('%'))
+    except (TypeError, ValueError):
+        return default
+
+
+class ClaimsTable:
+    """
+    Cleaned insurer claims data as columns: interned company names plus CSR (claims paid
+    ratio, %) and solvency arrays, in CSV order.
+    """
+
+    __slots__ = ("companies", "csr", "solvency")
+
+    def __init__(self, companies=(), csr=(), solvency=()):
+        self.companies = tuple(sys.intern(str(c)) for c in companies)
+        self.csr = np.asarray(csr, dtype=np.float64)
+        self.solvency = np.asarray(solvency, dtype=np.float64)
+
+    @classmethod
+    def from_csv(cls, path):
+        companies, csr, solvency = [], [], []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                company = (row.get('Company') or "").strip()
+                if not company:
+                    continue
+                companies.append(company)
+                # Claims_Paid_Ratio_Death -> CSR (percentage sign stripped)
+                csr.append(float(str(row.get('Claims_Paid_Ratio_Death', 0)).replace('%', '')))
+                # Solvency_2025 -> Solvency (non-numeric -> 0)
+                solvency.append(parse_number(row.get('Solvency_2025'), 0.0))
+        return cls(companies, csr, solvency)
+
+    def __len__(self):
+        return len(self.companies)
+
+    def rows(self):
+        """(company, csr, solvency) per insurer, as plain Python values."""
+        return zip(self.companies, self.csr.tolist(), self.solvency.tolist())
+
+
+# Absolute path calculation to avoid FileNotFoundError
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+CLAIMS_CSV_PATH = os.path.join(BASE_PATH, "data", "insurance_claims_dataset.csv")
+PRODUCTS_JSON_PATH = os.path.join(BASE_PATH, "data", "products_config.json")
+ELIGIBILITY_CSV_PATH = os.path.join(BASE_PATH, "data", "term_insurance_eligibility.csv")
+# The eligibility CSV is read by eligibility.EligibilityScreener, not the engine; it is a
+# source so that editing it triggers a data reload (and a new snapshot version for workers)
+SOURCE_PATHS = (CLAIMS_CSV_PATH, PRODUCTS_JSON_PATH, ELIGIBILITY_CSV_PATH)
+
+# Engine state stored in the data snapshot (see data_snapshot.py); the candidate column
+# arrays are included so worker processes share them through the mapped snapshot
+SNAPSHOT_FIELDS = ("claims", "product_data", "policy_index", "_candidate_columns_cache")
+
+# Premium grids kept per engine (i.e. per data version), keyed on the grid spec and bounded
+# by the premiums they hold in total (a premium costs ~40 bytes as a Python int in a list)
+PREMIUM_GRID_CACHE_VALUES = 1000000
+# Largest premium grid served in one call (values across all insurers)
+MAX_PREMIUM_GRID_VALUES = 500000
+# Accepted grid axis values
+PREMIUM_GRID_AGE_RANGE = (18, 100)
+PREMIUM_GRID_MAX_SUM_ASSURED = 1e11
+
+# Standard profile a freshly built engine must be able to quote (see validate)
+VALIDATION_PROFILE = {"age": 30, "income": 1500000, "smoker": False, "gender": "Male", "cover_type": "Flat", "policy_type": "Pure Term"}
+
 
 class InsuranceEngine:
-    def __init__(self):
+    def __init__(self, snapshot=None):
+        """`snapshot` overrides the ENGINE_SNAPSHOT mode ("true" | "readonly" | "false")."""
+        self._candidate_columns_cache = {}
+        self._premium_grids = OrderedDict() # grid spec -> (values, result)
+        self._premium_grid_values = 0
+        self._premium_grid_lock = threading.Lock()
+        mode = snapshot or snapshot_mode()
+        path = snapshot_path() if mode != MODE_OFF else None
+
+        # 0. PRE-PARSED SNAPSHOT (valid while the source files are unchanged; in readonly
+        # mode it is trusted as written by the process that owns it)
+        hashes = source_hashes(SOURCE_PATHS) if mode != MODE_READONLY else None
+        data, sources = load_snapshot(path, hashes) if path else (None, None)
+        if data is not None:
+            for field in SNAPSHOT_FIELDS:
+                setattr(self, field, data[field])
+            # Identifies the data this engine was built from (for caches keyed on it)
+            self.data_version = data_version(sources)
+            logger.info("⚡ Engine loaded from snapshot %s: %d insurer/policy candidates", self.data_version, sum(len(v) for v in self.policy_index.values()))
+            return
+
+        if mode == MODE_READONLY:
+            logger.warning("⚠️ No usable engine snapshot in readonly mode, parsing the data files")
+        self._source_hashes = hashes or source_hashes(SOURCE_PATHS)
+        self.data_version = data_version(self._source_hashes)
+        self._load_sources()
+        if mode == MODE_READWRITE and any(self.policy_index.values()):
+            self.write_snapshot(path)
+
+    def write_snapshot(self, path):
+        """Writes this engine's state (built from the sources) as the data snapshot at `path`."""
+        for category in POLICY_CATEGORIES:
+            self._candidate_columns(category)
+        save_snapshot(path, self._source_hashes, {field: getattr(self, field) for field in SNAPSHOT_FIELDS})
+
+    def validate(self):
+        """Returns why this engine must not serve traffic, or None if it is usable."""
+        if not self.claims:
+            return "claims data is empty"
+        if not any(self.policy_index.values()):
+            return "no insurer/policy candidates"
+        probe = self.get_recommendation(dict(VALIDATION_PROFILE))
+        if "error" in probe or not probe.get("recommendations"):
+            return f"probe recommendation failed ({probe.get('error', 'no recommendations')})"
+        return None
+
+    def _load_sources(self):
+        """Parses and cleans the claims CSV and product config, then builds the policy index."""
         # 1. LOAD THE REAL CLAIMS CSV
         try:
-            # Absolute path calculation to avoid FileNotFoundError
-            base_path = os.path.dirname(os.path.abspath(__file__))
-            csv_path = os.path.join(base_path, "data", "insurance_claims_dataset.csv")
-            json_path = os.path.join(base_path, "data", "products_config.json")
+            csv_path = CLAIMS_CSV_PATH
+            json_path = PRODUCTS_JSON_PATH
             
             # Check if files exist
             if not os.path.exists(csv_path):
-                print(f"❌ CSV NOT FOUND at: {csv_path}")
-                self.claims_df = pd.DataFrame()
+                logger.error("❌ CSV NOT FOUND at: %s", csv_path)
+                self.claims = ClaimsTable()
             else:
-                self.claims_df = pd.read_csv(csv_path)
-                print("✅ CSV Loaded Successfully")
+                self.claims = ClaimsTable.from_csv(csv_path)
+                logger.info("✅ CSV Loaded Successfully")
 
             if not os.path.exists(json_path):
-                print(f"❌ JSON NOT FOUND at: {json_path}")
+                logger.error("❌ JSON NOT FOUND at: %s", json_path)
                 self.product_data = {}
             else:
                 with open(json_path, "r") as f:
                     self.product_data = json.load(f)
-                print("✅ Product Config Loaded Successfully")
-            
-            # Load Eligibility CSV
-            eligibility_csv_path = os.path.join(base_path, "data", "term_insurance_eligibility.csv")
-            if not os.path.exists(eligibility_csv_path):
-                print(f"❌ Eligibility CSV NOT FOUND at: {eligibility_csv_path}")
-                self.eligibility_df = pd.DataFrame()
-            else:
-                self.eligibility_df = pd.read_csv(eligibility_csv_path)
-                print("✅ Eligibility CSV Loaded Successfully")
+                logger.info("✅ Product Config Loaded Successfully")
             
-            # --- DATA CLEANING ---
-            if not self.claims_df.empty:
-                # Rename columns safely
-                rename_map = {
-                    'Company': 'Company',
-                    'Claims_Paid_Ratio_Death': 'CSR',      
-                    'Solvency_2025': 'Solvency'
-                }
-                # Only rename columns that actually exist
-                self.claims_df.rename(columns={k: v for k, v in rename_map.items() if k in self.claims_df.columns}, inplace=True)
+            # --- POLICY INDEX ---
+            self.policy_index = self._build_policy_index()
+            logger.info("✅ Policy Index Built: %d insurer/policy candidates", sum(len(v) for v in self.policy_index.values()))
 
-                # Clean percentage signs
-                if 'CSR' in self.claims_df.columns and self.claims_df['CSR'].dtype == 'object':
-                    self.claims_df['CSR'] = self.claims_df['CSR'].str.replace('%', '').astype(float)
-                
-                # Ensure Solvency is numeric
-                if 'Solvency' in self.claims_df.columns:
-                    self.claims_df['Solvency'] = pd.to_numeric(self.claims_df['Solvency'], errors='coerce').fillna(0)
-                
         except Exception as e:
-            print(f"❌ CRITICAL ERROR initializing engine: {e}")
-            self.claims_df = pd.DataFrame()
+            logger.exception("❌ CRITICAL ERROR initializing engine: %s", e)
+            self.claims = ClaimsTable()
             self.product_data = {}
-            self.eligibility_df = pd.DataFrame()
+            self.policy_index = {}
 
-    def get_eligibility_context(self):
+    def _build_policy_index(self):
         """
-        Returns a formatted string of eligibility conditions from the CSV.
+        Precompiles the claims data and product catalogue into
+        {category: {company: candidate}} so recommendations only need dict lookups.
+        Companies keep the claims CSV order; each gets the first config entry matching the category.
         """
-        if self.eligibility_df.empty:
-            return "No eligibility data available."
-        
-        context = "### Term Insurance Eligibility Conditions:\n"
-        for _, row in self.eligibility_df.iterrows():
-            category = row.get('Category', 'General')
-            condition = row.get('Condition / Profile', 'Unknown')
-            impact = row.get('Impact on Eligibility', 'Review needed')
-            context += f"- **{category}**: If user matches '{condition}', then: {impact}\n"
-        
-        return context
+        index = {category: {} for category in POLICY_CATEGORIES}
+        if not self.claims:
+            return index
+
+        policies = self.product_data.get('policies', [])
+
+        for company, csr, solvency in self.claims.rows():
+            matching_policies = [
+                p for p in policies
+                if company.lower() in p['metadata']['insurer_name'].lower()
+            ]
+
+            for category in POLICY_CATEGORIES:
+                policy_details = next((p for p in matching_policies if policy_matches_category(p, category)), None)
+
+                # STRICT POLICY: If no specific match found, this company is not a candidate.
+                # Do NOT fallback to matching_policies[0].
+                if not policy_details:
+                    continue
+
+                # Get features description
+                features_dict = policy_details.get('features', {})
+                # Try to get USP from various fields
+                usp = features_dict.get('description') if features_dict else None
+                if not usp:
+                    usp = policy_details.get('metadata', {}).get('marketing_tagline')
+                if not usp:
+                    usp = "Comprehensive Coverage"
+
+                index[category][company] = {
+                    "company": company,
+                    "policy": policy_details,
+                    "product_name": str(policy_details['metadata']['product_name']),
+                    "usp": str(usp),
+                    "features": features_dict,
+                    "csr": csr,
+                    "solvency": solvency,
+                }
+
+        return index
 
     def calculate_needs(self, income, liabilities, age, assets=0):
         # Age-based multipliers
-        multiplier = 20 # Fallback
-        
-        if 18 <= age <= 35:
-            multiplier = 25
-        elif 36 <= age <= 40:
-            multiplier = 20
-        elif 41 <= age <= 45:
-            multiplier = 15
-        elif 46 <= age <= 50:
-            multiplier = 12
-        elif 51 <= age <= 55:
-            multiplier = 10
-        elif 56 <= age <= 60:
-            multiplier = 5
+        multiplier = DEFAULT_MULTIPLIER
+        for min_age, max_age, band_multiplier in AGE_MULTIPLIER_BANDS:
+            if min_age <= age <= max_age:
+                multiplier = band_multiplier
+                break
             
-        print(f"💰 Calculating Needs: Age={age}, Income={income}, Liabilities={liabilities}, Assets={assets}, Multiplier={multiplier}x")
+        logger.debug("💰 Calculating Needs: Age=%s, Income=%s, Liabilities=%s, Assets=%s, Multiplier=%sx", age, income, liabilities, assets, multiplier)
         
         # Formula: (Income * Multiplier) + Liabilities - Assets
         total_needs = (income * multiplier) + liabilities - assets
@@ -103,30 +351,8 @@ class InsuranceEngine:
         return float(max(total_needs, 0))
 
     def estimate_premium(self, age, sum_insured, smoker, is_rop, gender, company_name="Unknown", cover_type="Flat", policy_type="Pure Term"):
-        base_rate = 12000
-        
-        # Company Tier Factors (Simulated Market Rates)
-        # Tier 1 (Premium Brands) -> Higher Cost
-        # Tier 2 (Value Brands) -> Medium Cost
-        # Tier 3 (Budget Brands) -> Lower Cost
-        company_factors = {
-            "HDFC Life": 1.15,
-            "ICICI Prudential": 1.12,
-            "SBI Life": 1.10,
-            "Max Life": 1.05,
-            "Bajaj Allianz Life": 1.00, # Benchmark
-            "TATA AIA": 1.02,
-            "Kotak Life": 0.95,
-            "Pramerica Life": 0.90,
-            "Aditya Birla": 1.00
-        }
-        
-        # Default to 1.0 if company not found
-        market_factor = 1.0
-        for key, val in company_factors.items():
-            if key.lower() in str(company_name).lower():
-                market_factor = val
-                break
+        base_rate = BASE_PREMIUM_RATE
+        market_factor = company_market_factor(company_name)
         
         cover_factor = sum_insured / 10000000
         age_factor = 1 + ((age - 30) * 0.05) if age > 30 else 1
@@ -134,26 +360,9 @@ class InsuranceEngine:
         rop_factor = 1.9 if is_rop else 1.0
         gender_factor = 0.85 if str(gender).lower() == "female" else 1.0
         
-        # Cover Type Factor
-        cover_type_factor = 1.0
-        ct_lower = str(cover_type).lower()
-        if "increasing" in ct_lower:
-            cover_type_factor = 1.2
-        elif "decreasing" in ct_lower:
-            cover_type_factor = 0.9
-            
-        # Policy Type Factor
-        policy_type_factor = 1.0
-        pt_lower = str(policy_type).lower()
-        
-        if "joint" in pt_lower:
-            policy_type_factor = 1.7 # Spouse cover cost
-        elif "tulip" in pt_lower or "unit linked" in pt_lower:
-            policy_type_factor = 1.5 # Investment component
-        elif "return of premium" in pt_lower:
-            rop_factor = 1.9 # Ensure ROP factor is applied if selected here
-        elif "increasing" in pt_lower or "increased" in pt_lower:
-             cover_type_factor = 1.2 # Ensure Increasing factor is applied
+        cover_type_factor, policy_type_factor, forces_rop = premium_type_factors(str(cover_type), str(policy_type))
+        if forces_rop:
+            rop_factor = 1.9
         
         # Return standard int
         return int(round(base_rate * cover_factor * age_factor * smoker_factor * rop_factor * gender_factor * market_factor * cover_type_factor * policy_type_factor))
@@ -210,14 +419,15 @@ class InsuranceEngine:
         if features.get('whole_life'):
             score += 2
         
-        print(f"    ℹ️ Suitability for {policy_details['metadata']['product_name']}: {score}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("    ℹ️ Suitability for %s: %s", policy_details['metadata']['product_name'], score)
         return score
 
     def get_recommendation(self, user_data):
-        print(f"⚙️ Processing Recommendation for: {user_data}")
+        logger.debug("⚙️ Processing Recommendation for: %s", user_data)
         
-        if self.claims_df.empty:
-            print("⚠️ Claims DataFrame is empty. Cannot recommend.")
+        if not self.claims:
+            logger.warning("⚠️ Claims table is empty. Cannot recommend.")
             return {"error": "Data not loaded correctly"}
 
         try:
@@ -234,66 +444,11 @@ class InsuranceEngine:
 
             results = []
             
-            for _, row in self.claims_df.iterrows():
-                company = str(row.get('Company', 'Unknown'))
-                
-                # Match Policy
-                matching_policies = []
-                for p in self.product_data.get('policies', []):
-                    if company.lower() in p['metadata']['insurer_name'].lower():
-                        matching_policies.append(p)
-                
-                policy_details = None
-                
-                # Filter based on Policy Type Preference
-                user_policy_type = str(user_data.get('policy_type', 'Pure Term')).lower()
-                
-                # Debug: Print what we are looking for
-                # print(f"    🔍 Looking for policy type: '{user_policy_type}' for {company}")
-
-                for p in matching_policies:
-                    meta = p.get('metadata', {})
-                    brochure_type = str(meta.get('brochure_type', '')).lower()
-                    product_cat = str(meta.get('product_category', '')).lower()
-                    
-                    # Logic to select best fit
-                    if "tulip" in user_policy_type or "unit linked" in user_policy_type:
-                        if "ulip" in brochure_type or "unit linked" in product_cat:
-                            policy_details = p
-                            break
-                    elif "return of premium" in user_policy_type:
-                        if "return of premium" in brochure_type or "savings" in product_cat:
-                            policy_details = p
-                            break
-                    else: # Default to Pure Term
-                        # Strict check: Must be a Term Insurance or generic Pure Risk product
-                        if "term insurance" in brochure_type or "pure risk" in product_cat:
-                            # ensuring we don't accidentally pick a ULIP/ROP if brochure_type is vague but category isn't
-                            if "unit linked" not in product_cat and "savings" not in product_cat:
-                                policy_details = p
-                                break
-                
-                # STRICT POLICY: If no specific match found, SKIP this company.
-                # Do NOT fallback to matching_policies[0].
-                if not policy_details:
-                    # print(f"    ❌ No matching policy found for {company} (Req: {user_policy_type}). Skipping.")
-                    continue
+            # Candidates for the requested policy type, one per insurer (see _build_policy_index)
+            candidates = self.policy_index.get(normalise_policy_type(policy_type), {})
 
-
-                # Default values if no metadata
-                if policy_details:
-                    product_name = policy_details['metadata']['product_name']
-                    # Get features description
-                    features_dict = policy_details.get('features', {})
-                    # Try to get USP from various fields
-                    usp = features_dict.get('description')
-                    if not usp:
-                         usp = policy_details.get('metadata', {}).get('marketing_tagline')
-                    if not usp:
-                        usp = "Comprehensive Coverage"
-                else:
-                    # If matches found in Claims but not in Product Config, skip it to avoid hallucinations
-                    continue
+            for company, candidate in candidates.items():
+                policy_details = candidate['policy']
 
                 # Calculate Suitability
                 suitability_score = self.calculate_suitability_score(user_data, policy_details)
@@ -306,8 +461,8 @@ class InsuranceEngine:
                     age, recommended_cover, smoker, is_rop, gender, company, cover_type, policy_type
                 )
                 
-                csr_val = float(row.get('CSR', 0))
-                solvency_val = float(row.get('Solvency', 0))
+                csr_val = candidate['csr']
+                solvency_val = candidate['solvency']
                 
                 # Enhanced Score Logic:
                 # 1. Base Score = CSR (approx 95-99)
@@ -320,21 +475,21 @@ class InsuranceEngine:
 
                 results.append({
                     "company": company,
-                    "product_name": str(product_name),
-                    "usp": str(usp),
+                    "product_name": candidate['product_name'],
+                    "usp": candidate['usp'],
                     "premium_estimate": int(est_premium),
                     "csr": csr_val,
                     "solvency": solvency_val, # Expose Solvency for detailed trust analysis
                     "score": score,
                     "suitability": suitability_score,
-                    "features": features_dict # Pass full features for detailed explanation
+                    "features": candidate['features'] # Pass full features for detailed explanation
                 })
 
             # Sort by Score
             sorted_results = sorted(results, key=lambda x: x['score'], reverse=True)
             top_3 = sorted_results[:3]
 
-            print(f"✅ Generated {len(top_3)} recommendations")
+            logger.debug("✅ Generated %d recommendations", len(top_3))
             
             return {
                 "analysis": {
@@ -344,7 +499,420 @@ class InsuranceEngine:
                 "recommendations": top_3
             }
         except Exception as e:
-            print(f"❌ Logic Error: {e}")
-            import traceback
-            traceback.print_exc()
-            return {"error": str(e)}
\ No newline at end of file
+            logger.exception("❌ Logic Error: %s", e)
+            return {"error": str(e)}
+    # --- BATCH (VECTORIZED) RECOMMENDATIONS ---
+
+    def _candidate_columns(self, category):
+        """
+        Column arrays over the indexed candidates of one policy category, mirroring
+        the inputs of calculate_suitability_score and estimate_premium. Built once per category.
+        """
+        if category in self._candidate_columns_cache:
+            return self._candidate_columns_cache[category]
+
+        candidates = list(self.policy_index.get(category, {}).values())
+        columns = {
+            "candidates": candidates,
+            "min_age": np.empty(len(candidates), dtype=np.int64),
+            "max_age": np.empty(len(candidates), dtype=np.int64),
+            "min_income": np.empty(len(candidates), dtype=np.float64),
+            "has_rop": np.zeros(len(candidates), dtype=bool),
+            "is_cheap": np.zeros(len(candidates), dtype=bool),
+            "feature_bonus": np.zeros(len(candidates), dtype=np.int64),
+            "market_factor": np.empty(len(candidates), dtype=np.float64),
+            "csr": np.empty(len(candidates), dtype=np.float64),
+            "solvency": np.empty(len(candidates), dtype=np.float64),
+        }
+
+        for i, candidate in enumerate(candidates):
+            policy_details = candidate['policy']
+            eligibility = policy_details.get('eligibility', {})
+            features = policy_details.get('features', {})
+
+            columns["min_age"][i] = eligibility.get('min_age', 18)
+            columns["max_age"][i] = eligibility.get('max_age', 65)
+            columns["min_income"][i] = eligibility.get('min_income', 0)
+            columns["has_rop"][i] = bool(features.get('rop'))
+            columns["is_cheap"][i] = bool(features.get('cheap'))
+            columns["feature_bonus"][i] = (
+                (5 if features.get('critical_illness') else 0)
+                + (3 if features.get('wop') else 0)
+                + (2 if features.get('govt_backed') else 0)
+                + (2 if features.get('whole_life') else 0)
+            )
+            columns["market_factor"][i] = company_market_factor(candidate['company'])
+            columns["csr"][i] = candidate['csr']
+            columns["solvency"][i] = candidate['solvency']
+
+        self._candidate_columns_cache[category] = columns
+        return columns
+
+    def get_recommendations_batch(self, profiles, top_k=3):
+        """
+        Vectorized equivalent of get_recommendation for many profiles at once.
+        `profiles` is a list of user_data dicts or a DataFrame with the same columns.
+        Cover, premiums, suitability and scores are evaluated as profile x policy arrays;
+        returns one result dict per profile, identical to the scalar path.
+        """
+        if hasattr(profiles, 'to_dict'):
+            # DataFrame rows: treat missing cells like missing keys
+            profiles = [
+                {k: v for k, v in record.items() if not is_missing(v)}
+                for record in profiles.to_dict('records')
+            ]
+        profiles = list(profiles)
+
+        if not self.claims:
+            logger.warning("⚠️ Claims table is empty. Cannot recommend.")
+            return [{"error": "Data not loaded correctly"} for _ in profiles]
+
+        results = [None] * len(profiles)
+
+        # 1. Parse profiles exactly like the scalar path; bad rows get their own error
+        rows = []
+        for i, user_data in enumerate(profiles):
+            try:
+                cover_type = str(user_data.get('cover_type', 'Flat'))
+                policy_type = str(user_data.get('policy_type', 'Pure Term'))
+                rows.append((
+                    i,
+                    int(user_data.get('age', 30)),
+                    float(user_data.get('income', 1000000)),
+                    float(user_data.get('liabilities', 0)),
+                    float(user_data.get('income', 0)), # calculate_suitability_score defaults income to 0
+                    bool(user_data.get('smoker', False)),
+                    bool(user_data.get('is_rop', False)),
+                    str(user_data.get('gender', 'Male')).lower() == "female",
+                    normalise_policy_type(policy_type),
+                ) + premium_type_factors(cover_type, policy_type))
+            except Exception as e:
+                results[i] = {"error": str(e)}
+
+        if not rows:
+            return results
+
+        (positions, age, income, liabilities, suit_income, smoker, is_rop, female,
+         category, cover_type_factor, policy_type_factor, forces_rop) = (np.array(col) for col in zip(*rows))
+
+        # 2. Cover (calculate_needs)
+        multiplier = np.select(
+            [(age >= lo) & (age <= hi) for lo, hi, _ in AGE_MULTIPLIER_BANDS],
+            [m for _, _, m in AGE_MULTIPLIER_BANDS],
+            default=DEFAULT_MULTIPLIER,
+        )
+        recommended_cover = np.maximum((income * multiplier) + liabilities - 0, 0).astype(np.float64)
+
+        # 3. Per-profile premium factors (estimate_premium), multiplied in the scalar order
+        cover_factor = recommended_cover / 10000000
+        age_factor = np.where(age > 30, 1 + ((age - 30) * 0.05), 1.0)
+        smoker_factor = np.where(smoker, 1.5, 1.0)
+        rop_factor = np.where(is_rop | forces_rop, 1.9, 1.0)
+        gender_factor = np.where(female, 0.85, 1.0)
+        profile_premium = BASE_PREMIUM_RATE * cover_factor * age_factor * smoker_factor * rop_factor * gender_factor
+
+        for cat in POLICY_CATEGORIES:
+            sel = np.flatnonzero(category == cat)
+            if not len(sel):
+                continue
+
+            cols = self._candidate_columns(cat)
+            candidates = cols["candidates"]
+
+            # 4. Suitability matrix (profiles x candidates)
+            suitability = (
+                np.where(is_rop[sel, None], np.where(cols["has_rop"], 20, -30), 0)
+                + np.where((suit_income[sel, None] < 500000) & cols["is_cheap"], 15, 0)
+                + cols["feature_bonus"]
+            )
+            disqualified = (
+                (age[sel, None] < cols["min_age"])
+                | (age[sel, None] > cols["max_age"])
+                | (suit_income[sel, None] < cols["min_income"])
+            )
+            valid = ~disqualified & (suitability > -900)
+
+            # 5. Premiums and final score
+            premium = np.rint(
+                profile_premium[sel, None] * cols["market_factor"]
+                * cover_type_factor[sel, None] * policy_type_factor[sel, None]
+            ).astype(np.int64)
+            score = (cols["csr"] + (cols["solvency"] * 2)) + suitability - premium / 2500
+
+            # 6. Top-k per profile (stable, so ties keep claims order like sorted()); only
+            # those cells are converted to Python values, in bulk
+            order = np.argsort(np.where(valid, -score, np.inf), axis=1, kind='stable')[:, :top_k]
+            counts = np.minimum(valid.sum(axis=1), top_k).tolist() # Invalid ones sort last
+            top_premium = np.take_along_axis(premium, order, axis=1).tolist()
+            top_score = np.take_along_axis(score, order, axis=1).tolist()
+            top_suitability = np.take_along_axis(suitability, order, axis=1).tolist()
+            order = order.tolist()
+            profile_rows = zip(
+                positions[sel].tolist(), recommended_cover[sel].tolist(), income[sel].tolist(), liabilities[sel].tolist(),
+                counts, order, top_premium, top_score, top_suitability,
+            )
+
+            for position, cover, row_income, row_liabilities, count, row_order, row_premium, row_score, row_suitability in profile_rows:
+                recommendations = []
+                for k in range(count):
+                    candidate = candidates[row_order[k]]
+                    recommendations.append({
+                        "company": candidate['company'],
+                        "product_name": candidate['product_name'],
+                        "usp": candidate['usp'],
+                        "premium_estimate": row_premium[k],
+                        "csr": candidate['csr'],
+                        "solvency": candidate['solvency'],
+                        "score": row_score[k],
+                        "suitability": row_suitability[k],
+                        "features": candidate['features']
+                    })
+
+                results[position] = {
+                    "analysis": {
+                        "recommended_cover": cover,
+                        "logic": f"Calculated based on 20x annual income ({row_income}) plus liabilities ({row_liabilities})."
+                    },
+                    "recommendations": recommendations
+                }
+
+        logger.info("✅ Generated batch recommendations for %d profiles", len(profiles))
+        return results
+
+    # --- PREMIUM GRID (VECTORIZED) ---
+
+    def premium_grid(self, sum_assured, ages, smoker=(False, True), cover_types=("Flat",), policy_types=("Pure Term",), gender="Male", is_rop=False):
+        """
+        estimate_premium over the grid sum assured x entry age x smoker x cover type, for
+        every insurer offering each policy type, in one set of array operations. Cached per
+        grid spec (the returned dict is shared, do not mutate it). Premiums are flat lists
+        in C order over `dims`; each series carries its insurer's entry age range.
+        """
+        spec = (
+            tuple(float(v) for v in sum_assured),
+            tuple(int(v) for v in ages),
+            tuple(bool(v) for v in smoker),
+            tuple(str(v) for v in cover_types),
+            tuple(str(v) for v in policy_types),
+            str(gender).lower() == "female",
+            bool(is_rop),
+        )
+        if not all(spec[:5]):
+            raise ValueError("Every grid axis needs at least one value")
+        if not all(0 < v <= PREMIUM_GRID_MAX_SUM_ASSURED for v in spec[0]): # Also rejects NaN
+            raise ValueError(f"Sum assured values must be in (0, {PREMIUM_GRID_MAX_SUM_ASSURED:.0f}]")
+        min_age, max_age = PREMIUM_GRID_AGE_RANGE
+        if not all(min_age <= v <= max_age for v in spec[1]):
+            raise ValueError(f"Ages must be in [{min_age}, {max_age}]")
+
+        # The axes alone are capped too, so a grid without insurers cannot bypass the limit
+        cells = len(spec[0]) * len(spec[1]) * len(spec[2]) * len(spec[3])
+        insurers = sum(len(self.policy_index.get(normalise_policy_type(pt), {})) for pt in spec[4])
+        values = cells * max(insurers, len(spec[4]))
+        if values > MAX_PREMIUM_GRID_VALUES:
+            raise ValueError(f"Grid too large: {values} premiums (max {MAX_PREMIUM_GRID_VALUES})")
+
+        with self._premium_grid_lock:
+            entry = self._premium_grids.get(spec)
+            if entry is not None:
+                self._premium_grids.move_to_end(spec)
+                return entry[1]
+        result = self._premium_grid(*spec)
+        self._cache_premium_grid(spec, values, result)
+        return result
+
+    def _cache_premium_grid(self, spec, values, result):
+        if values > PREMIUM_GRID_CACHE_VALUES:
+            return
+        with self._premium_grid_lock:
+            if spec in self._premium_grids:
+                return # Computed concurrently by another request
+            self._premium_grids[spec] = (values, result)
+            self._premium_grid_values += values
+            while self._premium_grid_values > PREMIUM_GRID_CACHE_VALUES:
+                evicted, _ = self._premium_grids.popitem(last=False)[1]
+                self._premium_grid_values -= evicted
+
+    def _premium_grid(self, sum_assured, ages, smokers, cover_types, policy_types, female, is_rop):
+        # Axes: (sum assured, age, smoker, cover type); factors multiplied in estimate_premium's order
+        cover_factor = np.array(sum_assured, dtype=np.float64)[:, None, None, None] / 10000000
+        age = np.array(ages, dtype=np.int64)[None, :, None, None]
+        age_factor = np.where(age > 30, 1 + ((age - 30) * 0.05), 1.0)
+        smoker_factor = np.where(np.array(smokers)[None, None, :, None], 1.5, 1.0)
+        head = BASE_PREMIUM_RATE * cover_factor * age_factor * smoker_factor
+        gender_factor = 0.85 if female else 1.0
+
+        series = []
+        for policy_type in policy_types:
+            cols = self._candidate_columns(normalise_policy_type(policy_type))
+            if not cols["candidates"]:
+                continue
+            factors = [premium_type_factors(cover_type, policy_type) for cover_type in cover_types]
+            cover_type_factor = np.array([f[0] for f in factors])
+            policy_type_factor = factors[0][1]
+            rop_factor = 1.9 if is_rop or factors[0][2] else 1.0
+
+            # Insurer axis in front: (insurer, sum assured, age, smoker, cover type)
+            premiums = np.rint(
+                (head * rop_factor * gender_factor)[None]
+                * cols["market_factor"][:, None, None, None, None]
+                * cover_type_factor * policy_type_factor
+            ).astype(np.int64)
+
+            for i, candidate in enumerate(cols["candidates"]):
+                series.append({
+                    "policy_type": policy_type,
+                    "company": candidate['company'],
+                    "product_name": candidate['product_name'],
+                    "min_age": int(cols["min_age"][i]),
+                    "max_age": int(cols["max_age"][i]),
+                    "premiums": premiums[i].ravel().tolist(),
+                })
+
+        return {
+            "dims": ["sum_assured", "age", "smoker", "cover_type"],
+            "axes": {
+                "sum_assured": list(sum_assured),
+                "age": list(ages),
+                "smoker": list(smokers),
+                "cover_type": list(cover_types),
+            },
+            "gender": "Female" if female else "Male",
+            "is_rop": is_rop,
+            "series": series,
+        }
+
+
+# --- INCREMENTAL RE-RANKING ---
+
+# Preferences a RecommendationQuery re-ranks for without rebuilding (see RecommendationQuery)
+RERANK_FIELDS = ("smoker", "is_rop", "cover_type", "policy_type")
+
+
+class RecommendationQuery:
+    """
+    get_recommendation for one profile, keeping the intermediate factors so the ranking can
+    be redone cheaply when only RERANK_FIELDS change ("what if I pick ROP instead?"):
+    - cover and the profile-level head of the premium product (base rate x cover x age) are
+      computed once;
+    - per policy category, the eligible candidates with their market factor and CSR/solvency
+      score, and their suitability per is_rop value, are built on first use;
+    - a re-rank multiplies the smoker / ROP / gender / cover and policy type factors onto the
+      head and takes the top k with a heap.
+    Factors are multiplied in estimate_premium's order, so results equal get_recommendation.
+    """
+
+    def __init__(self, engine, user_data):
+        self.engine = engine
+        self.user_data = dict(user_data)
+        self.fixed = self.fixed_fields(user_data)
+        self.age, self.income, self.liabilities, self.suitability_income, self.female = self.fixed
+        self.recommended_cover = engine.calculate_needs(self.income, self.liabilities, self.age)
+
+        cover_factor = self.recommended_cover / 10000000
+        age_factor = 1 + ((self.age - 30) * 0.05) if self.age > 30 else 1
+        self._premium_head = BASE_PREMIUM_RATE * cover_factor * age_factor
+        self._categories = {} # category -> [(company, candidate, market_factor, base_score)]
+        self._suitability = {} # (category, is_rop) -> [suitability per candidate]
+
+    @staticmethod
+    def fixed_fields(user_data):
+        """The parsed inputs a re-rank cannot change (a new query is needed when they do)."""
+        return (
+            int(user_data.get('age', 30)),
+            float(user_data.get('income', 1000000)),
+            float(user_data.get('liabilities', 0)),
+            float(user_data.get('income', 0)), # calculate_suitability_score defaults income to 0
+            str(user_data.get('gender', 'Male')).lower() == "female",
+        )
+
+    def accepts(self, engine, user_data):
+        """Whether `user_data` can be answered by re-ranking this query."""
+        if engine is not self.engine:
+            return False
+        try:
+            return self.fixed_fields(user_data) == self.fixed
+        except (TypeError, ValueError):
+            return False
+
+    def _candidates(self, category):
+        entries = self._categories.get(category)
+        if entries is None:
+            entries = self._categories[category] = [
+                (company, candidate, company_market_factor(company), candidate['csr'] + (candidate['solvency'] * 2))
+                for company, candidate in self.engine.policy_index.get(category, {}).items()
+            ]
+        return entries
+
+    def _suitabilities(self, category, is_rop):
+        scores = self._suitability.get((category, is_rop))
+        if scores is None:
+            profile = {**self.user_data, "is_rop": is_rop}
+            scores = self._suitability[(category, is_rop)] = [
+                self.engine.calculate_suitability_score(profile, candidate['policy'])
+                for _, candidate, _, _ in self._candidates(category)
+            ]
+        return scores
+
+    def rerank(self, changes=None, top_k=3):
+        """The recommendation for this profile with `changes` (RERANK_FIELDS only) applied."""
+        user_data = {**self.user_data, **(changes or {})}
+        smoker = bool(user_data.get('smoker', False))
+        is_rop = bool(user_data.get('is_rop', False))
+        cover_type = str(user_data.get('cover_type', 'Flat'))
+        policy_type = str(user_data.get('policy_type', 'Pure Term'))
+        category = normalise_policy_type(policy_type)
+
+        cover_type_factor, policy_type_factor, forces_rop = premium_type_factors(cover_type, policy_type)
+        premium_head = (
+            self._premium_head
+            * (1.5 if smoker else 1.0)
+            * (1.9 if is_rop or forces_rop else 1.0)
+            * (0.85 if self.female else 1.0)
+        )
+
+        scored = []
+        for (company, candidate, market_factor, base_score), suitability in zip(self._candidates(category), self._suitabilities(category, is_rop)):
+            if suitability <= -900:
+                continue
+            premium = int(round(premium_head * market_factor * cover_type_factor * policy_type_factor))
+            scored.append((float(base_score + suitability - premium / 2500), company, candidate, premium, suitability))
+
+        # nlargest is stable like sorted(), so ties keep the claims order
+        top = heapq.nlargest(top_k, scored, key=lambda entry: entry[0])
+        return {
+            "analysis": {
+                "recommended_cover": float(self.recommended_cover),
+                "logic": f"Calculated based on 20x annual income ({self.income}) plus liabilities ({self.liabilities})."
+            },
+            "recommendations": [
+                {
+                    "company": company,
+                    "product_name": candidate['product_name'],
+                    "usp": candidate['usp'],
+                    "premium_estimate": premium,
+                    "csr": candidate['csr'],
+                    "solvency": candidate['solvency'],
+                    "score": score,
+                    "suitability": suitability,
+                    "features": candidate['features']
+                }
+                for score, company, candidate, premium, suitability in top
+            ]
+        }
+
+    def compare(self, alternatives, top_k=3, base=None):
+        """
+        What-if comparison: the recommendation for `base` (this query's profile, or a profile
+        it accepts) and one per alternative, each a dict of RERANK_FIELDS changes to the base
+        (e.g. [{"is_rop": True}, {"cover_type": "Increasing"}]).
+        """
+        for changes in alternatives:
+            unsupported = set(changes) - set(RERANK_FIELDS)
+            if unsupported:
+                raise ValueError(f"Cannot compare changes to {', '.join(sorted(unsupported))} (only {', '.join(RERANK_FIELDS)})")
+        base = dict(base or {})
+        return {
+            "base": self.rerank(base, top_k),
+            "alternatives": [{"changes": dict(changes), **self.rerank({**base, **changes}, top_k)} for changes in alternatives],
+        }
@@ -1,26 +1,43 @@
 import os
 import json
-import traceback
-import google.generativeai as genai
-from fastapi import FastAPI, HTTPException
+import time
+import asyncio
+import logging
+import threading
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, Response
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-# Import Logic
-from logic import InsuranceEngine
-
-import datetime
+# Import Logic (the engine module and the Gemini SDK are heavy: see STARTUP below)
+from sessions import create_session_store
+from tools import TOOLS, TOOL_FUNCTIONS, TurnContext, bind_turn
+from model_registry import ModelRegistry
+from model_health import ModelHealthTracker
+from intent_router import product_mention_pattern, route_intent, render_intent
+from eligibility import EligibilityScreener, format_verdicts
+from conversation_logger import create_conversation_logger
+from data_watcher import DataWatcher
+from profiler import create_request_profiler
+from recommendation_cache import create_recommendation_cache
+from profile_slots import create_recommendation_precomputer, extract_slots
+from log_config import configure_logging
+import metrics
 
 load_dotenv()
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
 @app.get("/")
 @app.head("/")
 def health_check():
-    return {"status": "ok"}
+    # Answers before warm-up has finished, so a sleeping host wakes up without waiting on it
+    return {"status": "ok", "ready": startup_ready.is_set()}
 
 # --- CORS SETUP ---
 app.add_middleware(
@@ -37,15 +54,88 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 # Check for missing or placeholder key
 if not GOOGLE_API_KEY or GOOGLE_API_KEY == "your_gemini_api_key_here":
-    print("⚠️ CRITICAL: GOOGLE_API_KEY is missing or invalid in .env file")
+    logger.critical("⚠️ CRITICAL: GOOGLE_API_KEY is missing or invalid in .env file")
     GOOGLE_API_KEY = None
 else:
-    print("✅ Google API Key found.")
-    genai.configure(api_key=GOOGLE_API_KEY)
+    logger.info("✅ Google API Key found.")
+
+# Alternative Gemini API endpoint, e.g. http://127.0.0.1:9000 for mock_gemini.py
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+# --- CONCURRENCY ---
+# The Gemini SDK calls are synchronous, so each /chat turn runs on this bounded pool
+# instead of the event loop. Turns beyond the limit queue here while the loop stays free.
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+gemini_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY, thread_name_prefix="gemini")
+
+# --- STARTUP ---
+# Importing the Gemini SDK and NumPy and building the engine takes seconds on a cold host.
+# With STARTUP_MODE=lazy (default) this warm-up runs on a background thread so the health
+# check answers immediately; chat requests wait for it. STARTUP_MODE=eager warms up at import
+# (see START at the end of this module).
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy").lower()
+genai = None # google.generativeai, once imported
+engine = None
+startup_ready = threading.Event()
+startup_error = None
+
+def warm_up():
+    global genai, engine, startup_error
+    started = time.perf_counter()
+    try:
+        import google.generativeai as gemini_sdk
+        from logic import InsuranceEngine
+
+        if GOOGLE_API_KEY and GEMINI_API_ENDPOINT:
+            # Gemini-compatible server (e.g. mock_gemini.py for load tests), over REST
+            gemini_sdk.configure(api_key=GOOGLE_API_KEY, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+            logger.warning("🧪 Gemini requests go to %s", GEMINI_API_ENDPOINT)
+        elif GOOGLE_API_KEY:
+            gemini_sdk.configure(api_key=GOOGLE_API_KEY)
+        genai = gemini_sdk
+
+        # Initialize Engine (from the data snapshot when the source files are unchanged)
+        engine = InsuranceEngine()
+        refresh_product_mention()
+        if DATA_RELOAD_INTERVAL_SECONDS > 0:
+            start_data_watcher()
+        session_store.start_purging()
+        logger.info("✅ Warm-up finished in %.2fs", time.perf_counter() - started)
+    except Exception as e:
+        logger.exception("❌ CRITICAL ERROR during warm-up: %s", e)
+        startup_error = e
+    finally:
+        startup_ready.set()
 
-# Initialize Engine
-engine = InsuranceEngine()
-ELIGIBILITY_CONTEXT = engine.get_eligibility_context()
+async def wait_until_ready():
+    if not startup_ready.is_set():
+        logger.info("⏳ Waiting for warm-up to finish...")
+        await asyncio.get_running_loop().run_in_executor(None, startup_ready.wait)
+    if startup_error is not None:
+        raise startup_error
+
+# Eligibility rules are matched locally on every turn; the prompt only carries a summary
+eligibility_screener = EligibilityScreener.from_csv()
+ELIGIBILITY_CONTEXT = eligibility_screener.prompt_context()
+
+# Server-side conversation sessions (history, profile slots, tool results, live chat)
+session_store = create_session_store()
+MAX_SESSION_TOOL_RESULTS = 10
+
+# Conversation records are written as JSONL by a background thread (never on the request path)
+conversation_logger = create_conversation_logger()
+
+# Opt-in sampling profiler for chat turns (PROFILE_SAMPLE_RATE / X-Profile header)
+request_profiler = create_request_profiler()
+
+# Plan quotes per (data version, canonical profile), shared by every session
+recommendation_cache = create_recommendation_cache()
+# ...warmed ahead of the final tool call with the quotes a session can still end with
+recommendation_precomputer = create_recommendation_precomputer(recommendation_cache)
+
+@app.on_event("shutdown")
+def flush_conversation_log():
+    conversation_logger.close()
 
 # --- DATA MODELS ---
 class ChatMessage(BaseModel):
@@ -53,7 +143,27 @@ class ChatMessage(BaseModel):
     content: str
 
 class ChatRequest(BaseModel):
-    messages: List[ChatMessage]
+    # Session mode: send only the new message (plus session_id after the first turn)
+    session_id: Optional[str] = None
+    message: Optional[str] = None
+    # Legacy mode: the full conversation on every turn
+    messages: Optional[List[ChatMessage]] = None
+
+class WhatIfRequest(BaseModel):
+    # Profile to compare from: `profile`, or the arguments of the session's last plan
+    session_id: Optional[str] = None
+    profile: Optional[dict] = None
+    alternatives: List[dict] # Preference changes, e.g. {"is_rop": true}
+    top_k: int = Field(3, ge=1, le=20)
+
+class PremiumGridRequest(BaseModel):
+    sum_assured: List[float]
+    ages: List[int]
+    smoker: List[bool] = [False, True]
+    cover_types: List[str] = ["Flat", "Increasing", "Decreasing"]
+    policy_types: List[str] = ["Pure Term"]
+    gender: str = "Male"
+    is_rop: bool = False
 
 # --- SYSTEM_PROMPT ---
 SYSTEM_PROMPT = """
@@ -77,7 +187,7 @@ You are 'InsureBot' 🤖, an expert, empathetic, and professional insurance advi
 - **Scope:** Do not say "I cannot answer" if it is a general insurance question. Answer it! Only say "No plans found" if the *specific tool search* returns empty for a valid profile.
 
 **Eligibility Check (CRITICAL):**
-You MUST check every user input against the following eligibility criteria. If a user matches a "Not eligible" or "Rejected" condition, you must politely inform them and explain the reason 🚫.
+User inputs are pre-screened against the eligibility criteria. When a user message ends with an `[Eligibility pre-screen]` note, you MUST politely inform the user of each listed verdict (e.g. "Not eligible", "Often rejected", "Higher premium") and explain the reason 🚫. The criteria cover:
 {eligibility_context}
 
 **Key Rule on Explanations:**
@@ -170,197 +280,758 @@ You MUST check every user input against the following eligibility criteria. If a
 **Tone:** Professional yet Friendly, Indian Context (Lakhs/Crores), Empathetic 🇮🇳.
 """
 
-@app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
-    try:
-        print("\n--- NEW CHAT REQUEST ---")
-        
-        # 1. History Management
-        gemini_history = []
-        if not request.messages:
-            raise HTTPException(status_code=400, detail="No messages provided")
+# --- CHAT HELPERS ---
+def resolve_session(request):
+    """
+    Returns (session, current_user_msg, expired) for a chat request. Blocking (backend I/O).
+    Session mode reuses the stored conversation; a session_id that is unknown or expired
+    starts a new session and sets `expired`, so the client can tell the user. Legacy
+    requests carrying the full `messages` list seed a new session from it.
+    """
+    if request.message is not None:
+        if not request.message.strip():
+            raise HTTPException(status_code=400, detail="Empty message")
+        session = session_store.get(request.session_id) if request.session_id else None
+        if session is not None:
+            return session, request.message, False
+        if request.session_id:
+            logger.warning("⌛ Session %s is unknown or expired, starting a new one", request.session_id[:12])
+        return session_store.create(), request.message, bool(request.session_id)
 
-        current_user_msg = request.messages[-1].content
-        print(f"User Message: {current_user_msg}")
-        
-        # Convert frontend messages to Gemini format
-        for msg in request.messages[:-1]:
-            role = "user" if msg.role == "user" else "model"
-            gemini_history.append({
-                "role": role,
-                "parts": [msg.content]
-            })
-
-        # 2. Tool Output Capture Mechanism
-        tool_outputs = []
-
-        # Define tool functions
-        def calculate_recommended_cover(income: float, dob: str = None, liabilities: float = 0.0, assets: float = 0.0, age_override: int = None):
-            """
-            Calculates the recommended life insurance cover (Sum Assured).
-            CRITICAL: You MUST provide `dob` in 'YYYY-MM-DD' format.
-            If `dob` is missing, you must provide `age_override`.
-            """
-            print(f"🛠️ Tool Triggered: calculate_recommended_cover | Income={income}, DOB={dob}, AgeOverride={age_override}")
-            
-            final_age = None
-
-            # 1. Try to calculate from DOB (Preferred)
-            if dob:
-                try:
-                    dob_date = datetime.datetime.strptime(dob, "%Y-%m-%d").date()
-                    today = datetime.date.today()
-                    final_age = today.year - dob_date.year - ((today.month, today.day) < (dob_date.month, dob_date.day))
-                    print(f"    ✅ Calculated Exact Age from DOB ({dob}) -> {final_age} years")
-                except Exception as e:
-                    print(f"    ⚠️ Error parsing DOB ({dob}): {e}")
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="No messages provided")
+
+    history = [
+        {"role": "user" if msg.role == "user" else "model", "content": msg.content}
+        for msg in request.messages[:-1]
+    ]
+    return session_store.create(history=history), request.messages[-1].content, False
+
+def build_gemini_history(history):
+    # Convert stored session messages to Gemini format
+    gemini_history = []
+    for msg in history:
+        gemini_history.append({
+            "role": msg["role"],
+            "parts": [msg["content"]]
+        })
+    return gemini_history
+
+def session_chat_history(session):
+    """
+    Starting history for a new chat object: the live chat's own history (which keeps
+    the function call turns) when available, otherwise the stored messages.
+    """
+    if session.chat is not None:
+        try:
+            return list(session.chat.history)
+        except Exception as e:
+            logger.warning("⚠️ Live chat history unusable, rebuilding from messages: %s", e)
+            session.chat = None
+    return build_gemini_history(session.history)
+
+def last_bot_message(session):
+    return session.history[-1]["content"] if session.history and session.history[-1]["role"] == "model" else None
+
+def attach_recommendations(final_response, tool_outputs):
+    # Check if we captured any tool outputs during this turn
+    # We only attach 'recommendations' if the calculate_insurance_plan tool was called.
+    if tool_outputs:
+        logger.debug("📦 Tool outputs found. Checking for plan recommendations...")
+        for output in tool_outputs:
+            if "recommendations" in output:
+                final_response["recommendations"] = output.get("recommendations")
+                final_response["analysis"] = output.get("analysis")
+                break # Only need one set of recommendations
+    return final_response
+
+def log_conversation(session, user_msg, response, source, latency=None, turn=None, error=None):
+    """Queues a structured record of the turn for the background conversation logger."""
+    with metrics.STAGE_SECONDS.labels("logging").time():
+        recommendations = response.get("recommendations") or []
+        conversation_logger.log({
+            "session_id": session.session_id if session else None,
+            "source": source, # "model" | "template" | "error"
+            "model": session.model_name if session and source == "model" else None,
+            "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+            "user": user_msg,
+            "bot": response.get("response"),
+            "tool_calls": [{"tool": r["tool"], "args": r["args"]} for r in turn.tool_results] if turn else [],
+            "recommendations": [
+                {"company": r.get("company"), "product_name": r.get("product_name"), "premium_estimate": r.get("premium_estimate"), "score": r.get("score")}
+                for r in recommendations
+            ],
+            "eligibility": [v["condition"] for v in response.get("eligibility") or []],
+            "error": error,
+        })
+
+def friendly_error_message(error_msg):
+    user_msg = f"I apologize, but I'm facing a technical issue. (Error: {error_msg})"
+    
+    if "429" in error_msg or "ResourceExhausted" in error_msg:
+         user_msg = "⚠️ I'm currently receiving too many requests (Quota Exceeded). Please try again in usually 1-2 minutes. (Free Tier Limit)"
+    elif "404" in error_msg:
+         user_msg = "⚠️ The AI model is currently unavailable. Please check the server configuration."
+    return user_msg
+
+# --- MODEL FALLBACK ---
+GEMINI_MODELS = [
+    "gemini-2.0-flash-exp",
+    "gemini-2.0-flash",
+    "gemini-flash-latest",
+    "gemini-pro-latest"
+]
+
+# Per-attempt timeout so a hung model counts as a failure instead of stalling the turn
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+GEMINI_REQUEST_OPTIONS = {"timeout": GEMINI_TIMEOUT_SECONDS}
+
+# Models (with their tool declarations and system prompt) are built once per name
+model_registry = ModelRegistry(SYSTEM_PROMPT, TOOLS, lambda: ELIGIBILITY_CONTEXT)
+
+# Shared circuit breaker over the chain: models failing with 429/404/timeouts are skipped
+# until their cooldown elapses, then probed once before taking traffic again
+model_health = ModelHealthTracker(failure_threshold=int(os.getenv("MODEL_FAILURE_THRESHOLD", "3")))
+
+# Optional hedging for /chat: if the primary model is slower than its observed latency
+# percentile (or a fixed delay), the next model is raced against it
+GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+GEMINI_HEDGE_DELAY_MS = float(os.getenv("GEMINI_HEDGE_DELAY_MS", "0")) # 0 = use the observed percentile
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "90"))
+GEMINI_HEDGE_DEFAULT_DELAY_MS = float(os.getenv("GEMINI_HEDGE_DEFAULT_DELAY_MS", "4000")) # Until latencies are observed
+# Attempts run on their own pool: waiting on gemini_executor from inside it could deadlock
+hedge_executor = ThreadPoolExecutor(max_workers=GEMINI_MAX_CONCURRENCY * 2, thread_name_prefix="gemini-hedge")
+
+# --- DATA HOT RELOAD ---
+# When the data files change, a new engine (and eligibility screener) is built in the
+# background, validated and swapped in. Turns already running keep the engine their
+# TurnContext captured; caches derived from the old data are dropped via data_reload_hooks.
+DATA_RELOAD_INTERVAL_SECONDS = float(os.getenv("DATA_RELOAD_INTERVAL_SECONDS", "5")) # 0 disables
+data_reload_lock = threading.Lock()
+
+# Insurer / product names of the current engine; a message naming one skips the template fast path
+PRODUCT_MENTION = None
+
+def refresh_product_mention():
+    global PRODUCT_MENTION
+    names = [(company, True) for company, _, _ in engine.claims.rows()] if engine.claims else []
+    for policy in engine.product_data.get("policies", []):
+        names.append((policy["metadata"].get("insurer_name", ""), True))
+        names.append((policy["metadata"].get("product_name", ""), False))
+    PRODUCT_MENTION = product_mention_pattern(names)
+
+data_reload_hooks = [model_registry.invalidate, recommendation_cache.clear, refresh_product_mention]
+
+def reload_data():
+    """Rebuilds the engine and eligibility rules from the data files and swaps them in if valid."""
+    global engine, eligibility_screener, ELIGIBILITY_CONTEXT
+    from logic import InsuranceEngine
+
+    with data_reload_lock:
+        new_engine = InsuranceEngine()
+        new_screener = EligibilityScreener.from_csv()
+        problem = new_engine.validate()
+        if problem is None and not new_screener.rules:
+            problem = "no eligibility rules"
+        if problem is not None:
+            logger.error("❌ Reloaded data rejected: %s. Still serving data version %s", problem, engine.data_version if engine else None)
+            return False
+
+        engine, eligibility_screener = new_engine, new_screener
+        ELIGIBILITY_CONTEXT = new_screener.prompt_context()
+        for hook in data_reload_hooks:
+            hook()
+        logger.info("✅ Data reloaded: now serving data version %s", new_engine.data_version)
+        return True
+
+def start_data_watcher():
+    from logic import SOURCE_PATHS
+    from data_snapshot import snapshot_mode, snapshot_path, MODE_READONLY
+
+    # Readonly workers follow the snapshot their master rebuilds from the data files (see
+    # gunicorn.conf.py), so every worker serves the same data version
+    if snapshot_mode() == MODE_READONLY:
+        paths = (snapshot_path(),)
+    else:
+        paths = SOURCE_PATHS
+    DataWatcher(paths, reload_data, interval=DATA_RELOAD_INTERVAL_SECONDS).start()
+
+def open_chat(session, model_name, base_history):
+    # Reuse the session's live chat when it is bound to this model (and the model was not
+    # rebuilt since, e.g. after a data reload changed the prompt); otherwise start one
+    model = model_registry.get(model_name)
+    if session.chat is not None and session.model_name == model_name and session.chat.model is model:
+        return session.chat
+    return model.start_chat(history=list(base_history))
+
+def record_attempt(model_name, started, error=None):
+    """
+    Records the outcome of one model attempt in the circuit breaker and the metrics.
+    Returns the failure kind (see classify_error), or None for a success.
+    """
+    latency = time.perf_counter() - started
+    kind = None
+    if error is None:
+        model_health.record_success(model_name, latency)
+    else:
+        kind = model_health.record_failure(model_name, error)
+        metrics.MODEL_ERRORS.labels(model_name, kind).inc()
+    metrics.MODEL_ATTEMPT_SECONDS.labels(model_name, kind or "ok").observe(latency)
+    return kind
+
+def skip_model(model_name):
+    logger.info("⏭️ Skipping %s (circuit open)", model_name)
+    metrics.MODEL_SKIPS.labels(model_name).inc()
+
+def fall_back(failed_model):
+    """Counts a turn moving on from `failed_model` to the next model in the chain."""
+    if failed_model is not None:
+        metrics.MODEL_FALLBACKS.labels(failed_model).inc()
+
+def run_model_fallback(session, current_user_msg):
+    """
+    Sends the user message through the healthy models of the GEMINI_MODELS chain until one
+    answers. Blocking (runs on gemini_executor); raises the last error if every model fails.
+    """
+    final_response = None
+    last_error = None
+    failed_model = None
+    with metrics.STAGE_SECONDS.labels("history_build").time():
+        base_history = session_chat_history(session)
+    route = model_health.route(GEMINI_MODELS)
+
+    for model_name in route:
+        # Skip models whose circuit is open (recent 429/404/timeouts)
+        if not model_health.begin(model_name, forced=len(route) == 1):
+            skip_model(model_name)
+            continue
+
+        fall_back(failed_model)
+        started = time.perf_counter()
+        try:
+            logger.info("🔄 Attempting with model: %s", model_name)
             
-            # 2. Fallback to age_override
-            if final_age is None:
-                if age_override is not None:
-                    print(f"    ⚠️ Using provided age_override: {age_override}")
-                    final_age = age_override
-                else:
-                    return {"error": "CRITICAL: Could not determine Age. Please provide valid DOB (YYYY-MM-DD)."}
+            chat = open_chat(session, model_name, base_history)
+            chat.enable_automatic_function_calling = True
 
+            # 4. Send Message (.text raises on a blocked / empty response: that is a failure too)
             try:
-                cover = engine.calculate_needs(income=income, liabilities=liabilities, age=final_age, assets=assets)
-                return {
-                    "recommended_cover": cover, 
-                    "calculated_age": final_age  # Return this so the bot knows the TRUE age
-                }
-            except Exception as e:
-                print(f"❌ Error inside calculate_recommended_cover: {e}")
-                return {"error": "Calculation failed"}
-
-        def calculate_insurance_plan(age: int, income: float, smoker: bool, gender: str, liabilities: float = 0.0, is_rop: bool = False, cover_type: str = "Flat", policy_type: str = "Pure Term"):
-            """
-            Calculates best term insurance plans. Use this ONLY after gathering all detailed profile info (Age, Income, Smoker, Gender, Cover Type, Policy Type, etc.).
-            """
-            print(f"🛠️ Tool Triggered: calculate_insurance_plan | Age={age}, Income={income}, Gender={gender}, Smoker={smoker}, CoverType={cover_type}, PolicyType={policy_type}")
-            
-            user_data = {
-                "age": age,
-                "income": income,
-                "liabilities": liabilities,
-                "smoker": smoker,
-                "gender": gender,
-                "is_rop": is_rop,
-                "cover_type": cover_type,
-                "policy_type": policy_type
+                response = chat.send_message(current_user_msg, request_options=GEMINI_REQUEST_OPTIONS)
+                text = response.text
+            except Exception:
+                if chat is session.chat:
+                    session.chat = None # Don't keep reusing a chat that just failed
+                raise
+            logger.info("✅ AI Response Generated using %s", model_name)
+            record_attempt(model_name, started)
+            session.chat, session.model_name = chat, model_name
+
+            # 5. Construct Response
+            final_response = {
+                "response": text,
+                "recommendations": None,
+                "analysis": None
             }
             
-            # Run the logic
+            # If successful, break the loop
+            break
+
+        except Exception as e:
+            logger.warning("⚠️ Model %s failed: %s", model_name, e)
+            last_error, failed_model = e, model_name
+            # Record the outcome so following requests route around this model
+            if record_attempt(model_name, started, e) == "429":
+                logger.warning("--> Quota exceeded, switching to next model...")
+            # Other errors (like 400 bad request) might not be solved by switching models,
+            # but for robustness we try the rest of the chain anyway.
+            continue
+
+    if not final_response:
+         # If we exhausted all models and still have no response
+         raise last_error if last_error else Exception("All models failed")
+
+    return final_response
+
+def hedge_delay(model_name):
+    """Seconds to wait for `model_name` before racing the next model against it."""
+    if GEMINI_HEDGE_DELAY_MS:
+        return GEMINI_HEDGE_DELAY_MS / 1000
+    observed = model_health.latency_percentile(model_name, GEMINI_HEDGE_PERCENTILE)
+    return observed if observed is not None else GEMINI_HEDGE_DEFAULT_DELAY_MS / 1000
+
+def run_hedged_attempt(model_name, base_history, current_user_msg, attempt, profile=None):
+    # One hedged attempt on its own thread, chat object and TurnContext, so a losing
+    # attempt can never touch the session or leak its tool outputs.
+    started = time.perf_counter()
+    with bind_turn(attempt), request_profiler.attach(profile):
+        try:
+            chat = model_registry.get(model_name).start_chat(history=list(base_history), enable_automatic_function_calling=True)
+            response = chat.send_message(current_user_msg, request_options=GEMINI_REQUEST_OPTIONS)
+            text = response.text
+        except Exception as e:
+            finish_hedged_attempt(model_name, started, attempt, e)
+            raise
+    finish_hedged_attempt(model_name, started, attempt)
+    return chat, text
+
+def finish_hedged_attempt(model_name, started, attempt, error=None):
+    # A loser's outcome is not recorded: its late successes would skew the latency
+    # percentiles hedge_delay() uses. Only its (probe) claim is given back.
+    if attempt.cancelled:
+        model_health.release(model_name)
+        logger.info("🛑 Discarded the outcome of the cancelled attempt on %s", model_name)
+        return
+    record_attempt(model_name, started, error)
+
+def run_model_hedged(session, current_user_msg, turn):
+    """
+    Hedged variant of run_model_fallback. The first healthy model is called; if it has not
+    answered within hedge_delay() the next model is raced against it and the first success
+    wins. Failed attempts fall through to the next model as usual.
+    """
+    with metrics.STAGE_SECONDS.labels("history_build").time():
+        base_history = session_chat_history(session)
+    route = model_health.route(GEMINI_MODELS)
+    candidates = iter(route)
+    running = {} # future -> (model_name, TurnContext)
+    last_error = None
+    profile = request_profiler.current()
+
+    def start_next():
+        for model_name in candidates:
+            if model_health.begin(model_name, forced=len(route) == 1):
+                logger.info("🔄 Attempting with model: %s", model_name)
+                attempt = TurnContext(turn.engine, session, turn.recommendation_cache)
+                future = hedge_executor.submit(run_hedged_attempt, model_name, base_history, current_user_msg, attempt, profile)
+                running[future] = (model_name, attempt)
+                return True
+            skip_model(model_name)
+        return False
+
+    start_next()
+    while running:
+        # Only a lone attempt gets hedged; once two are racing we just wait
+        timeout = hedge_delay(next(iter(running.values()))[0]) if len(running) == 1 else None
+        done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if not done:
+            slow_model = next(iter(running.values()))[0]
+            if start_next():
+                logger.info("⏱️ %s is slow (> %.2fs), hedging with a second model", slow_model, timeout)
+                continue
+            # Nothing left to hedge with: wait for the attempt in flight
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            model_name, attempt = running.pop(future)
             try:
-                result = engine.get_recommendation(user_data)
-                # CAPTURE THE RESULT
-                tool_outputs.append(result)
-                return result
+                chat, text = future.result()
             except Exception as e:
-                print(f"❌ Error inside tool execution: {e}")
-                traceback.print_exc()
-                return {"error": "Calculation failed"}
-
-        # 3. Model Fallback Mechanism
-        GEMINI_MODELS = [
-            "gemini-2.0-flash-exp",
-            "gemini-2.0-flash",
-            "gemini-flash-latest",
-            "gemini-pro-latest"
-        ]
-
-        final_response = None
-        last_error = None
-
-        for model_name in GEMINI_MODELS:
-            try:
-                print(f"🔄 Attempting with model: {model_name}")
-                
-                # Initialize Model with the Tool
-                formatted_system_prompt = SYSTEM_PROMPT.format(today=datetime.date.today(), eligibility_context=ELIGIBILITY_CONTEXT)
-                model = genai.GenerativeModel(
-                    model_name=model_name,
-                    tools=[calculate_recommended_cover, calculate_insurance_plan],
-                    system_instruction=formatted_system_prompt
-                )
-
-                chat = model.start_chat(history=gemini_history, enable_automatic_function_calling=True)
-
-                # 4. Send Message
-                response = chat.send_message(current_user_msg)
-                print(f"✅ AI Response Generated using {model_name}")
-
-                # 5. Construct Response
+                logger.warning("⚠️ Model %s failed: %s", model_name, e)
+                last_error = e
+                if not running and start_next():
+                    fall_back(model_name)
+                continue
+
+            logger.info("✅ AI Response Generated using %s", model_name)
+            # Cancel the losers; their results (and tool outputs) are discarded. One already
+            # running cannot be interrupted mid-request: its next tool call raises TurnCancelled,
+            # so it makes no further model calls, and its outcome is not recorded.
+            for other_future, (other_model, other_attempt) in running.items():
+                other_attempt.cancelled = True
+                if other_future.cancel():
+                    model_health.release(other_model) # Never ran: give back its (probe) claim
+                logger.info("🛑 Cancelled hedged attempt on %s", other_model)
+
+            turn.merge(attempt)
+            session.chat, session.model_name = chat, model_name
+            return {
+                "response": text,
+                "recommendations": None,
+                "analysis": None
+            }
+
+    raise last_error if last_error else Exception("All models failed")
+
+def run_model_stream(session, current_user_msg, emit):
+    """
+    Streaming variant of run_model_fallback. Text chunks are passed to
+    emit("token", ...) as they arrive; a "recommendations" event is emitted as soon as
+    calculate_insurance_plan returns. The SDK cannot combine stream=True with automatic
+    function calling, so tool calls are dispatched here. Returns the full response text.
+    """
+    with metrics.STAGE_SECONDS.labels("history_build").time():
+        base_history = session_chat_history(session)
+    last_error = None
+    failed_model = None
+    route = model_health.route(GEMINI_MODELS)
+
+    for model_name in route:
+        if not model_health.begin(model_name, forced=len(route) == 1):
+            skip_model(model_name)
+            continue
+
+        fall_back(failed_model)
+        streamed = False
+        chat = None
+        started = time.perf_counter()
+        try:
+            logger.info("🔄 Attempting stream with model: %s", model_name)
+
+            chat = open_chat(session, model_name, base_history)
+            chat.enable_automatic_function_calling = False
+
+            message = current_user_msg
+            text_parts = []
+            while True:
+                response = chat.send_message(message, stream=True, request_options=GEMINI_REQUEST_OPTIONS)
+
+                function_calls = []
+                for chunk in response:
+                    parts = chunk.candidates[0].content.parts if chunk.candidates else []
+                    for part in parts:
+                        if "function_call" in part:
+                            function_calls.append(part.function_call)
+                        elif part.text:
+                            streamed = True
+                            text_parts.append(part.text)
+                            emit("token", {"text": part.text})
+
+                if not function_calls:
+                    break
+
+                # Run the requested tools and send their results back to the model
+                function_responses = []
+                for fc in function_calls:
+                    result = TOOL_FUNCTIONS[fc.name](**dict(fc.args))
+                    if isinstance(result, dict) and "recommendations" in result:
+                        emit("recommendations", {
+                            "recommendations": result.get("recommendations"),
+                            "analysis": result.get("analysis")
+                        })
+                    function_responses.append(genai.protos.Part(
+                        function_response=genai.protos.FunctionResponse(name=fc.name, response=result)
+                    ))
+                message = function_responses
+
+            logger.info("✅ AI Response Streamed using %s", model_name)
+            record_attempt(model_name, started)
+            session.chat, session.model_name = chat, model_name
+            return "".join(text_parts)
+
+        except Exception as e:
+            logger.warning("⚠️ Model %s failed: %s", model_name, e)
+            record_attempt(model_name, started, e)
+            if chat is not None and chat is session.chat:
+                session.chat = None # A broken stream leaves the chat history unusable
+            # Once tokens reached the client we cannot silently restart on another model
+            if streamed:
+                raise
+            last_error, failed_model = e, model_name
+            continue
+
+    raise last_error if last_error else Exception("All models failed")
+
+def new_eligibility_verdicts(session, current_user_msg):
+    """Verdicts of the local eligibility pre-screen not yet raised in this session."""
+    raised = {v["condition"] for v in session.eligibility}
+    return [v for v in eligibility_screener.screen(current_user_msg, session.profile) if v["condition"] not in raised]
+
+def run_chat_turn(session, current_user_msg, emit=None, profile=False):
+    """
+    One conversation turn on the Gemini executor: runs the model (streaming when `emit`
+    is given), attaches this turn's recommendations and persists the session. With
+    `profile` the turn is recorded by the sampling profiler.
+    """
+    started = time.perf_counter()
+    with request_profiler.sample(profile, session), session.lock, bind_turn(TurnContext(engine, session, recommendation_cache)) as turn:
+        # Only the matched eligibility verdicts travel with the message to the model
+        verdicts = new_eligibility_verdicts(session, current_user_msg)
+        model_msg = current_user_msg
+        if verdicts:
+            logger.info("🚫 Eligibility pre-screen matched %d condition(s)", len(verdicts))
+            model_msg = f"{current_user_msg}\n\n{format_verdicts(verdicts)}"
+
+        # Slots stated in this message (smoker, cover type, ...); the quotes the
+        # conversation can still end with are computed while the model runs
+        session.profile.update(extract_slots(last_bot_message(session), current_user_msg, session.profile))
+        recommendation_precomputer.schedule(engine, session.profile)
+
+        try:
+            if emit is None and GEMINI_HEDGE_ENABLED:
+                final_response = run_model_hedged(session, model_msg, turn)
+            elif emit is None:
+                final_response = run_model_fallback(session, model_msg)
+            else:
                 final_response = {
-                    "response": response.text,
+                    "response": run_model_stream(session, model_msg, emit),
                     "recommendations": None,
                     "analysis": None
                 }
-                
-                # If successful, break the loop
-                break
+        except Exception as e:
+            log_conversation(session, current_user_msg, {}, "error", time.perf_counter() - started, turn, error=str(e))
+            raise
 
-            except Exception as e:
-                print(f"⚠️ Model {model_name} failed: {e}")
-                last_error = e
-                error_msg = str(e)
-                # Check if it's a quota error to decide if we should continue or stop
-                if "429" in error_msg or "ResourceExhausted" in error_msg:
-                    print("--> Quota exceeded, switching to next model...")
-                    continue
-                else:
-                    # If it's another type of error (like 400 bad request), it might not be solved by switching models, 
-                    # but for robustness we can try or just re-raise. 
-                    # Here we will continue to try other models just in case.
-                    continue
-
-        if not final_response:
-             # If we exhausted all models and still have no response
-             raise last_error if last_error else Exception("All models failed")
-
-        # Check if we captured any tool outputs during execution
-        # We only attach 'recommendations' if the calculate_insurance_plan tool was called.
-        if tool_outputs:
-            print("📦 Tool outputs found. Checking for plan recommendations...")
-            for output in tool_outputs:
-                if "recommendations" in output:
-                    final_response["recommendations"] = output.get("recommendations")
-                    final_response["analysis"] = output.get("analysis")
-                    break # Only need one set of recommendations
-
-        # --- LOG CONVERSATION (NEW) ---
-        try:
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            # Added more prominent separator and spacing as requested
-            separator = "=" * 60
-            log_entry = f"\n{separator}\n[{timestamp}]\nUSER: {current_user_msg}\n\nBOT: {final_response['response']}\n{separator}\n\n\n"
-            
-            with open("conversation_logs.txt", "a", encoding="utf-8") as f:
-                f.write(log_entry)
-            print("📝 Conversation logged successfully.")
-        except Exception as log_err:
-            print(f"⚠️ Failed to log conversation: {log_err}")
+        with metrics.STAGE_SECONDS.labels("response_assembly").time():
+            attach_recommendations(final_response, turn.plan_outputs())
+            final_response["session_id"] = session.session_id
+            if verdicts:
+                final_response["eligibility"] = verdicts
+                session.eligibility.extend(verdicts)
+
+            # Commit the turn to the session
+            session.history.append({"role": "user", "content": current_user_msg})
+            session.history.append({"role": "model", "content": final_response["response"]})
+            session.profile.update(turn.profile)
+            if turn.last_query is not None:
+                session.last_query = turn.last_query
+            session.tool_results.extend(turn.tool_results)
+            del session.tool_results[:-MAX_SESSION_TOOL_RESULTS]
+            session_store.save(session)
+        recommendation_precomputer.schedule(engine, session.profile)
+
+    # --- LOG CONVERSATION (NEW) ---
+    log_conversation(session, current_user_msg, final_response, "model", time.perf_counter() - started, turn)
+    return final_response
+
+def answer_locally(session, current_user_msg):
+    """
+    Template fast path (see intent_router): answers fixed explanation turns without a model
+    call and records them in the session and its live chat so the model keeps the context.
+    Returns the response dict, or None to fall through to Gemini. Blocking (saves the session).
+    """
+    started = time.perf_counter()
+    # Never wait for a session busy with a model turn: it takes the normal path
+    if not session.lock.acquire(blocking=False):
+        return None
+    try:
+        intent = route_intent(last_bot_message(session), current_user_msg, PRODUCT_MENTION)
+        if intent is None or new_eligibility_verdicts(session, current_user_msg):
+            return None
+
+        reply = render_intent(intent)
+        logger.info("⚡ Answered locally (%s)", intent)
+
+        session.history.append({"role": "user", "content": current_user_msg})
+        session.history.append({"role": "model", "content": reply})
+        if session.chat is not None:
+            session.chat.history.extend([
+                genai.protos.Content(role="user", parts=[genai.protos.Part(text=current_user_msg)]),
+                genai.protos.Content(role="model", parts=[genai.protos.Part(text=reply)]),
+            ])
+        session_store.save(session)
+    finally:
+        session.lock.release()
+
+    local_response = {"response": reply, "recommendations": None, "analysis": None, "session_id": session.session_id}
+    log_conversation(session, current_user_msg, local_response, "template", time.perf_counter() - started)
+    return local_response
+
+@app.post("/chat")
+async def chat_endpoint(request: ChatRequest, x_profile: Optional[str] = Header(default=None)):
+    session = None
+    started = time.perf_counter()
+    source = "error"
+    in_flight = metrics.REQUESTS_IN_FLIGHT.labels("chat")
+    in_flight.inc()
+    try:
+        logger.info("--- NEW CHAT REQUEST ---")
+        
+        # 1. Session / History Management (backend I/O, off the event loop)
+        loop = asyncio.get_running_loop()
+        with metrics.STAGE_SECONDS.labels("session").time():
+            session, current_user_msg, expired = await loop.run_in_executor(None, resolve_session, request)
+        logger.debug("User Message: %s", current_user_msg)
+        await wait_until_ready()
 
-        return final_response
+        # 2. Template fast path for fixed explanation steps
+        response = await loop.run_in_executor(None, answer_locally, session, current_user_msg)
+        if response is not None:
+            source = "template"
+        else:
+            # 3. Model Fallback Mechanism (blocking SDK calls -> Gemini executor, off the event loop)
+            profile = request_profiler.wanted(x_profile)
+            response = await loop.run_in_executor(gemini_executor, run_chat_turn, session, current_user_msg, None, profile)
+            source = "model"
+        if expired:
+            response["session_expired"] = True
+        return response
 
     except Exception as e:
-        print(f"❌ CRITICAL BACKEND ERROR: {e}")
-        # Print the full stack trace to the terminal so we can debug
-        traceback.print_exc()
+        metrics.CHAT_ERRORS.labels("chat").inc()
+        # Log the full stack trace so we can debug
+        logger.exception("❌ CRITICAL BACKEND ERROR: %s", e)
         error_msg = str(e)
-        user_msg = f"I apologize, but I'm facing a technical issue. (Error: {error_msg})"
-        
-        if "429" in error_msg or "ResourceExhausted" in error_msg:
-             user_msg = "⚠️ I'm currently receiving too many requests (Quota Exceeded). Please try again in usually 1-2 minutes. (Free Tier Limit)"
-        elif "404" in error_msg:
-             user_msg = "⚠️ The AI model is currently unavailable. Please check the server configuration."
 
         return {
-            "response": user_msg,
-            "error": error_msg
+            "response": friendly_error_message(error_msg),
+            "error": error_msg,
+            "session_id": session.session_id if session else None
         }
+    finally:
+        in_flight.dec()
+        metrics.REQUEST_SECONDS.labels("chat", source).observe(time.perf_counter() - started)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint (this worker's metrics)."""
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/status/models")
+def model_status():
+    """Circuit state, failure counts and latency of every model in the fallback chain."""
+    return {
+        "fallback_chain": GEMINI_MODELS,
+        "route": model_health.route(GEMINI_MODELS),
+        "models": model_health.snapshot()
+    }
+
+@app.post("/recommendations/what-if")
+async def what_if_endpoint(request: WhatIfRequest):
+    """
+    Compares plan recommendations for several preference changes (smoker, is_rop,
+    cover_type, policy_type) in one call, re-ranking a single query for all of them.
+    """
+    from logic import RecommendationQuery
+
+    await wait_until_ready()
+    loop = asyncio.get_running_loop()
+    session = await loop.run_in_executor(None, session_store.get, request.session_id) if request.session_id else None
+    profile = request.profile
+    if profile is None and session is not None:
+        plans = [r["args"] for r in session.tool_results if r["tool"] == "calculate_insurance_plan"]
+        profile = plans[-1] if plans else None
+    if profile is None:
+        raise HTTPException(status_code=400, detail="No profile: pass `profile` or the session_id of a conversation with a plan")
+
+    def compare(current_engine):
+        # The session's last query is reused when it covers the profile
+        query = session.last_query if session is not None else None
+        if query is None or not query.accepts(current_engine, profile):
+            query = RecommendationQuery(current_engine, profile)
+        return query.compare(request.alternatives, request.top_k, base=profile)
+
+    try:
+        return await loop.run_in_executor(None, compare, engine)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/premiums/grid")
+async def premium_grid_endpoint(request: PremiumGridRequest):
+    """
+    Premium estimates over sum assured x age x smoker x cover type for every insurer of the
+    requested policy types (columnar, for sliders and premium-vs-cover charts).
+    """
+    await wait_until_ready()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, lambda: engine.premium_grid(
+            request.sum_assured, request.ages, request.smoker, request.cover_types,
+            request.policy_types, request.gender, request.is_rop,
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/status/cache")
+def cache_status():
+    """Size and hit/miss statistics of the recommendation cache (this worker)."""
+    return recommendation_cache.stats()
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, x_profile: Optional[str] = Header(default=None)):
+    """
+    Server-sent events variant of /chat. Events:
+    - token: {"text": ...} model text as it is generated
+    - recommendations: {"recommendations": [...], "analysis": {...}} once the plan tool returns
+    - done: {"response": full_text, "session_id": ...}
+    - error: {"response": user-facing message, "error": ..., "session_id": ...}
+    done and error carry "session_expired": true when the given session_id was unknown or
+    expired and a new session was started.
+    """
+    logger.info("--- NEW STREAMING CHAT REQUEST ---")
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+
+    with metrics.STAGE_SECONDS.labels("session").time():
+        session, current_user_msg, expired = await loop.run_in_executor(None, resolve_session, request)
+    logger.debug("User Message: %s", current_user_msg)
+
+    sse_headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    session_fields = {"session_id": session.session_id, **({"session_expired": True} if expired else {})}
+
+    try:
+        await wait_until_ready()
+        local_response = await loop.run_in_executor(None, answer_locally, session, current_user_msg)
+    except Exception as e:
+        # e.g. warm-up failed: reported as an error event like a failed model turn
+        metrics.CHAT_ERRORS.labels("chat_stream").inc()
+        logger.exception("❌ CRITICAL BACKEND ERROR (stream): %s", e)
+        metrics.REQUEST_SECONDS.labels("chat_stream", "error").observe(time.perf_counter() - started)
+        error_msg = str(e)
+
+        async def error_stream():
+            yield format_sse("error", {"response": friendly_error_message(error_msg), "error": error_msg, **session_fields})
+        return StreamingResponse(error_stream(), media_type="text/event-stream", headers=sse_headers)
+
+    if local_response is not None:
+        metrics.REQUEST_SECONDS.labels("chat_stream", "template").observe(time.perf_counter() - started)
+
+        async def local_stream():
+            yield format_sse("token", {"text": local_response["response"]})
+            yield format_sse("done", {"response": local_response["response"], **session_fields})
+        return StreamingResponse(local_stream(), media_type="text/event-stream", headers=sse_headers)
+
+    queue = asyncio.Queue()
+
+    # Called from the executor thread; hands events to the event loop
+    def emit(event, data):
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    in_flight = metrics.REQUESTS_IN_FLIGHT.labels("chat_stream")
+    profile = request_profiler.wanted(x_profile)
+
+    def produce():
+        source = "error"
+        try:
+            final_response = run_chat_turn(session, current_user_msg, emit, profile)
+            source = "model"
+            emit("done", {"response": final_response["response"], **session_fields})
+        except Exception as e:
+            metrics.CHAT_ERRORS.labels("chat_stream").inc()
+            logger.exception("❌ CRITICAL BACKEND ERROR (stream): %s", e)
+            error_msg = str(e)
+            emit("error", {"response": friendly_error_message(error_msg), "error": error_msg, **session_fields})
+        finally:
+            in_flight.dec()
+            metrics.REQUEST_SECONDS.labels("chat_stream", source).observe(time.perf_counter() - started)
+            emit(None, None)
+
+    in_flight.inc()
+    loop.run_in_executor(gemini_executor, produce)
+
+    async def event_stream():
+        while True:
+            event, data = await queue.get()
+            if event is None:
+                break
+            yield format_sse(event, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=sse_headers,
+    )
+
+# --- START ---
+# Kicked off last so everything warm-up touches is defined
+if STARTUP_MODE == "eager":
+    warm_up()
+else:
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
 # if __name__ == "__main__":
 #     import uvicorn
 #     # Make sure we bind to 0.0.0.0 to be accessible
-#     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+#     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,250 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process metrics in the Prometheus text exposition format (served by GET /metrics),
+# without depending on prometheus_client. Recording is a dict lookup plus a short lock per
+# observation, cheap enough to leave on in production. Every worker process keeps its own
+# values (scrape each worker, or aggregate per `instance`).
+
+# Latency buckets in seconds: sub-millisecond engine work up to slow model generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """A metric family: one child per combination of label values."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def labels(self, *values, **labels):
+        """The child for these label values (positional, or by label name)."""
+        if not values:
+            values = [labels[name] for name in self.labelnames]
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f"{name}_total{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """Monotonic count; exported as `<name>_total`."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = value
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. requests in flight."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def inc(self, amount=1):
+        self._children[()].inc(amount)
+
+    def dec(self, amount=1):
+        self._children[()].dec(amount)
+
+    def set(self, value):
+        self._children[()].set(value)
+
+    def track_inprogress(self):
+        return self._children[()].track_inprogress()
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last slot: above the largest bucket
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """Observes the duration of the `with` block (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = _format_value(float(bound)) if bound != float("inf") else "+Inf"
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, [('le', le)])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of observations (latencies in seconds) over cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._children[()].observe(value)
+
+    def time(self):
+        return self._children[()].time()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = MetricsRegistry()
+
+# --- InsureBot metrics ---
+# Stages of a chat turn: session, history_build, response_assembly, logging (model attempts
+# and tool calls have their own histograms below)
+STAGE_SECONDS = REGISTRY.histogram(
+    "insurebot_chat_stage_seconds", "Duration of each stage of a chat turn", ["stage"])
+REQUEST_SECONDS = REGISTRY.histogram(
+    "insurebot_chat_request_seconds", "End-to-end duration of chat requests", ["endpoint", "source"])
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "insurebot_chat_requests_in_flight", "Chat requests being processed", ["endpoint"])
+MODEL_ATTEMPT_SECONDS = REGISTRY.histogram(
+    "insurebot_model_attempt_seconds", "Duration of each Gemini attempt (including automatic tool calls)", ["model", "outcome"])
+MODEL_ERRORS = REGISTRY.counter(
+    "insurebot_model_errors", "Failed Gemini attempts per model and kind (429, 404, timeout, error)", ["model", "kind"])
+MODEL_FALLBACKS = REGISTRY.counter(
+    "insurebot_model_fallbacks", "Turns moved on to the next model after a failed attempt", ["from_model"])
+MODEL_SKIPS = REGISTRY.counter(
+    "insurebot_model_skipped", "Models skipped because their circuit was open", ["model"])
+TOOL_SECONDS = REGISTRY.histogram(
+    "insurebot_tool_seconds", "Duration of tool calls made by the model", ["tool"])
+RECOMMENDATION_CACHE_LOOKUPS = REGISTRY.counter(
+    "insurebot_recommendation_cache_lookups", "Recommendation cache lookups by result (hit, miss)", ["result"])
+CHAT_ERRORS = REGISTRY.counter(
+    "insurebot_chat_errors", "Chat requests that failed on every model", ["endpoint"])
@@ -0,0 +1,167 @@
+"""
+Local Gemini stand-in for load tests (no API quota used).
+
+Serves the REST endpoints the google.generativeai SDK calls (generateContent and
+streamGenerateContent) and answers with the scripted salesperson replies of fake_gemini.py,
+including the calculate_recommended_cover / calculate_insurance_plan function calls. Each
+reply is delayed by a configurable latency distribution, and 429/404 errors can be injected
+per model to exercise the GEMINI_MODELS fallback chain and circuit breaker.
+
+Point the backend at it with GEMINI_API_ENDPOINT (see README), then drive it with
+load_test.py.
+
+Latency specs (milliseconds): fixed:800 | uniform:300,1500 | lognormal:800,0.5 (median, sigma)
+Error specs: MODEL=KIND:RATE, MODEL may be * (e.g. gemini-2.0-flash-exp=429:1.0, *=404:0.01)
+
+Usage:
+    python mock_gemini.py [--port 9000] [--latency lognormal:800,0.5]
+        [--model-latency MODEL=SPEC ...] [--error MODEL=KIND:RATE ...]
+        [--stream-chunk-ms 15] [--reply-words 120] [--seed 1]
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import threading
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from fake_gemini import ScriptedGemini
+
+ERRORS = {
+    "429": ("RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota)."),
+    "404": ("NOT_FOUND", "models/{model} is not found for API version v1beta, or is not supported for generateContent."),
+    "500": ("INTERNAL", "An internal error has occurred."),
+}
+
+
+def parse_latency(spec):
+    """Latency spec -> function returning a delay in seconds."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = values[0], values[1] if len(values) > 1 else 0.5
+        return lambda rng: rng.lognormvariate(math.log(median), sigma) / 1000
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+def parse_error(spec):
+    """MODEL=KIND:RATE -> (model, kind, rate)."""
+    model, _, rest = spec.partition("=")
+    kind, _, rate = rest.partition(":")
+    if kind not in ERRORS:
+        raise ValueError(f"Unknown error kind {kind} (one of {', '.join(ERRORS)})")
+    return model, kind, float(rate or 1.0)
+
+
+class MockGemini:
+    def __init__(self, latency="lognormal:800,0.5", model_latency=None, errors=(), stream_chunk_ms=15, reply_words=120, seed=None):
+        self.latency = parse_latency(latency)
+        self.model_latency = {model: parse_latency(spec) for model, spec in (model_latency or {}).items()}
+        self.errors = list(errors) # [(model | "*", kind, rate)]
+        self.stream_chunk = stream_chunk_ms / 1000
+        self.script = ScriptedGemini(reply_words=reply_words)
+        self.rng = random.Random(seed)
+        self.stats = Counter() # (model, outcome) -> requests
+        self._lock = threading.Lock()
+
+    def injected_error(self, model):
+        for pattern, kind, rate in self.errors:
+            if pattern in ("*", model) and self.rng.random() < rate:
+                return kind
+        return None
+
+    def delay(self, model):
+        return self.model_latency.get(model, self.latency)(self.rng)
+
+    def record(self, model, outcome):
+        with self._lock:
+            self.stats[(model, outcome)] += 1
+
+
+def error_response(model, kind):
+    status, message = ERRORS[kind]
+    code = int(kind)
+    return JSONResponse({"error": {"code": code, "message": message.format(model=model), "status": status}}, status_code=code)
+
+
+def candidate(part):
+    return {"candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP", "index": 0}]}
+
+
+def create_app(mock):
+    app = FastAPI()
+
+    @app.get("/stats")
+    def stats():
+        return {f"{model} {outcome}": count for (model, outcome), count in sorted(mock.stats.items())}
+
+    @app.post("/v1beta/models/{call}")
+    async def generate(call: str, request: Request):
+        model, _, method = call.partition(":")
+        body = await request.json()
+        await asyncio.sleep(mock.delay(model))
+
+        kind = mock.injected_error(model)
+        if kind is not None:
+            mock.record(model, kind)
+            return error_response(model, kind)
+        mock.record(model, "ok")
+
+        turns = [(c.get("role", "user"), c.get("parts", [])) for c in body.get("contents", [])]
+        part = mock.script.reply(turns)
+        if method != "streamGenerateContent":
+            return candidate(part)
+
+        # The SDK's REST transport reads a streamed JSON array of responses
+        async def stream():
+            chunks = [part] if "text" not in part else [
+                {"text": word + " "} for word in part["text"].split(" ")
+            ]
+            yield "["
+            for i, chunk in enumerate(chunks):
+                if i:
+                    yield ",\n"
+                    await asyncio.sleep(mock.stream_chunk)
+                yield json.dumps(candidate(chunk))
+            yield "]"
+
+        return StreamingResponse(stream(), media_type="application/json")
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Gemini stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", default="lognormal:800,0.5", help="Default latency spec")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SPEC", help="Latency spec for one model")
+    parser.add_argument("--error", action="append", default=[], metavar="MODEL=KIND:RATE", help="Inject 429/404/500 errors")
+    parser.add_argument("--stream-chunk-ms", type=float, default=15, help="Delay between streamed chunks")
+    parser.add_argument("--reply-words", type=int, default=120, help="Length of text replies")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    mock = MockGemini(
+        latency=args.latency,
+        model_latency=dict(spec.split("=", 1) for spec in args.model_latency),
+        errors=[parse_error(spec) for spec in args.error],
+        stream_chunk_ms=args.stream_chunk_ms,
+        reply_words=args.reply_words,
+        seed=args.seed,
+    )
+    import uvicorn
+    print(f"🧪 Mock Gemini on http://{args.host}:{args.port} (latency {args.latency}, errors {args.error or 'none'})")
+    uvicorn.run(create_app(mock), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Circuit states
+CLOSED = "closed" # Healthy: requests go through
+OPEN = "open" # Failing: skipped until the cooldown elapses
+HALF_OPEN = "half_open" # Cooldown elapsed: one probe request decides open vs closed
+
+# Seconds a circuit stays open after each kind of failure (doubled on repeated failed probes)
+DEFAULT_COOLDOWNS = {
+    "429": 60, # Quota exhausted
+    "404": 600, # Model not available for this key
+    "timeout": 30,
+    "error": 30,
+}
+MAX_COOLDOWN = 900
+
+# Failure kinds that open the circuit immediately; others need `failure_threshold` in a row
+IMMEDIATE_FAILURES = ("429", "404")
+
+
+def classify_error(error):
+    """Maps a Gemini SDK exception onto one of "429", "404", "timeout" or "error"."""
+    error_msg = str(error)
+    error_type = type(error).__name__
+    if "429" in error_msg or "ResourceExhausted" in error_msg or error_type == "ResourceExhausted":
+        return "429"
+    if "404" in error_msg or error_type == "NotFound":
+        return "404"
+    if error_type in ("DeadlineExceeded", "TimeoutError", "ReadTimeout") or "timed out" in error_msg.lower() or "deadline" in error_msg.lower():
+        return "timeout"
+    return "error"
+
+
+class ModelHealth:
+    """Circuit state and outcome counters of one model."""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.cooldown = 0
+        self.probe_in_flight = False
+        self.successes = 0
+        self.failures = {kind: 0 for kind in DEFAULT_COOLDOWNS}
+        self.last_error = None
+        self.latencies = deque(maxlen=200) # Recent successful latencies (seconds)
+
+    def to_dict(self, now):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in_seconds": max(0, round(self.open_until - now, 1)) if self.state == OPEN else 0,
+            "successes": self.successes,
+            "failures": dict(self.failures),
+            "last_error": self.last_error,
+            "latency_p50_ms": _percentile_ms(self.latencies, 50),
+            "latency_p90_ms": _percentile_ms(self.latencies, 90),
+        }
+
+
+def _percentile_ms(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 1)
+
+
+class ModelHealthTracker:
+    """
+    Shared health of the Gemini fallback chain. Outcomes of every attempt are recorded per
+    model; a model whose circuit is open is skipped until its cooldown elapses, after which a
+    single half-open probe request decides whether it is healthy again.
+    """
+
+    def __init__(self, cooldowns=None, failure_threshold=3):
+        self.cooldowns = dict(DEFAULT_COOLDOWNS, **(cooldowns or {}))
+        self.failure_threshold = failure_threshold
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _health(self, model_name):
+        # Caller holds self._lock
+        health = self._models.get(model_name)
+        if health is None:
+            health = self._models[model_name] = ModelHealth(model_name)
+        return health
+
+    def route(self, models):
+        """
+        Models worth trying, in preference order: closed circuits and open ones whose cooldown
+        has elapsed. If every circuit is open, the model that recovers first is returned so the
+        request still gets one attempt.
+        """
+        now = time.monotonic()
+        with self._lock:
+            usable = []
+            for model_name in models:
+                health = self._health(model_name)
+                if health.state == CLOSED:
+                    usable.append(model_name)
+                elif health.state == OPEN and now >= health.open_until:
+                    usable.append(model_name)
+                elif health.state == HALF_OPEN and not health.probe_in_flight:
+                    usable.append(model_name)
+            if usable:
+                return usable
+            return [min(models, key=lambda m: self._health(m).open_until)] if models else []
+
+    def begin(self, model_name, forced=False):
+        """
+        Claims an attempt on `model_name`. Returns False if the circuit is open (or another
+        request is already probing it), unless `forced`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            health = self._health(model_name)
+            if health.state == CLOSED or forced:
+                return True
+            if health.state == OPEN and now >= health.open_until:
+                health.state = HALF_OPEN
+            if health.state == HALF_OPEN and not health.probe_in_flight:
+                health.probe_in_flight = True
+                logger.info("🩺 Probing model %s (half-open)", model_name)
+                return True
+            return False
+
+    def release(self, model_name):
+        """Gives back a claim from begin() that was never used (e.g. a hedged attempt cancelled before it ran)."""
+        with self._lock:
+            self._health(model_name).probe_in_flight = False
+
+    def record_success(self, model_name, latency):
+        with self._lock:
+            health = self._health(model_name)
+            if health.state != CLOSED:
+                logger.info("✅ Model %s recovered, circuit closed", model_name)
+            health.state = CLOSED
+            health.consecutive_failures = 0
+            health.cooldown = 0
+            health.probe_in_flight = False
+            health.successes += 1
+            health.latencies.append(latency)
+
+    def record_failure(self, model_name, error):
+        """Records a failed attempt and returns its kind (see classify_error)."""
+        kind = classify_error(error)
+        now = time.monotonic()
+        with self._lock:
+            health = self._health(model_name)
+            health.failures[kind] += 1
+            health.consecutive_failures += 1
+            health.last_error = f"{kind}: {str(error)[:200]}"
+
+            should_open = (
+                health.state == HALF_OPEN # Failed probe
+                or kind in IMMEDIATE_FAILURES
+                or health.consecutive_failures >= self.failure_threshold
+            )
+            if should_open:
+                # Back off harder when a probe fails again
+                base = self.cooldowns[kind]
+                health.cooldown = min(MAX_COOLDOWN, health.cooldown * 2 if health.state == HALF_OPEN else base) or base
+                health.state = OPEN
+                health.open_until = now + health.cooldown
+                logger.warning("🚧 Circuit opened for %s (%s) for %ss", model_name, kind, health.cooldown)
+            health.probe_in_flight = False
+        return kind
+
+    def latency_percentile(self, model_name, q):
+        """Observed latency percentile of successful attempts in seconds, or None without data."""
+        with self._lock:
+            latencies = list(self._health(model_name).latencies)
+        value = _percentile_ms(latencies, q)
+        return value / 1000 if value is not None else None
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return {name: health.to_dict(now) for name, health in self._models.items()}
@@ -0,0 +1,55 @@
+import datetime
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Builds each GenerativeModel once per model name (tool declarations + formatted system
+    prompt) and reuses it across requests. A model is rebuilt only when its prompt inputs
+    change: the date or the context returned by `context_provider`.
+    """
+
+    def __init__(self, system_prompt, tools, context_provider):
+        self.system_prompt = system_prompt
+        self.tools = tools
+        self.context_provider = context_provider
+        self._models = {} # model_name -> (fingerprint, GenerativeModel)
+        self._prompt = None # (fingerprint, formatted system prompt)
+        self._lock = threading.Lock()
+
+    def _fingerprint(self):
+        return (datetime.date.today(), self.context_provider())
+
+    def _formatted_prompt(self, fingerprint):
+        # Caller holds self._lock
+        if self._prompt is None or self._prompt[0] != fingerprint:
+            today, context = fingerprint
+            self._prompt = (fingerprint, self.system_prompt.format(today=today, eligibility_context=context))
+        return self._prompt[1]
+
+    def get(self, model_name):
+        fingerprint = self._fingerprint()
+        with self._lock:
+            entry = self._models.get(model_name)
+            if entry is not None and entry[0] == fingerprint:
+                return entry[1]
+
+            import google.generativeai as genai # Heavy import, deferred until the first model is built
+
+            logger.info("🧩 Building model %s", model_name)
+            model = genai.GenerativeModel(
+                model_name=model_name,
+                tools=self.tools,
+                system_instruction=self._formatted_prompt(fingerprint)
+            )
+            self._models[model_name] = (fingerprint, model)
+            return model
+
+    def invalidate(self):
+        """Drops every cached model, e.g. after the prompt data changed."""
+        with self._lock:
+            self._models.clear()
+            self._prompt = None
@@ -0,0 +1,168 @@
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from intent_router import COVER_QUESTION, POLICY_QUESTION
+
+logger = logging.getLogger(__name__)
+
+# Speculative plan quotes. Per SYSTEM_PROMPT the Gender answer triggers
+# calculate_insurance_plan in the same turn, but age, income and liabilities are known from
+# calculate_recommended_cover turns earlier, and smoker / cover type / policy type are plain
+# answers to the Qualifying questions. Those slots are tracked on the session from the
+# user's messages, and as soon as age and income are known the quotes for both genders (and
+# both smoker values while that is still open) are computed in the background into the
+# recommendation cache, so the final tool call is a cache hit.
+
+SMOKER_QUESTION = re.compile(r"smok|tobacco")
+
+# Explicit statements, whatever was asked
+NON_SMOKER_ANSWER = re.compile(
+    r"\b(non[\s-]?smok(er|ing)|not an? (\w+ )?smoker|(do\s*n[o']?t|dont|do not|never|no longer) smoke|quit smoking)\b"
+)
+SMOKER_ANSWER = re.compile(r"\b(i (do )?smoke|i am a smoker|i'm a smoker|smoker)\b")
+# Bare answers, only when the bot has just asked about smoking
+NO_ANSWER = re.compile(r"^\s*(no|nope|nah|never|not at all)\b")
+YES_ANSWER = re.compile(r"^\s*(yes|yeah|yep|yup|occasionally|sometimes|regularly)\b")
+
+GENDER_QUESTION = re.compile(r"\bgender\b|\bmale or female\b")
+# "I'm a woman" says whose gender it is; a bare "Female." only answers the gender question
+SELF_GENDER_ANSWER = re.compile(r"\b(i am|i'm|im)( an?)? (male|female|man|woman)\b")
+BARE_GENDER_ANSWER = re.compile(r"^\W*(male|female|man|woman)\W*$")
+
+# Turning return of premium down, e.g. "no return of premium", "without ROP"
+NO_ROP_ANSWER = re.compile(r"\b(no|not|without|don'?t want)\b[\w\s]{0,15}?(return of premium|\brop\b|money[\s-]?back)")
+
+# Keywords -> the value passed as cover_type / policy_type (first match wins)
+COVER_TYPE_ANSWERS = (
+    (re.compile(r"return of premium|\brop\b|money[\s-]?back"), "Return of Premium"),
+    (re.compile(r"\bincreas"), "Increasing"),
+    (re.compile(r"\bdecreas"), "Decreasing"),
+    (re.compile(r"zero[\s-]?cost"), "Zero Cost"),
+    (re.compile(r"\b(flat|level)\b"), "Flat"),
+)
+POLICY_TYPE_ANSWERS = (
+    (re.compile(r"\bt?ulip\b|unit[\s-]?linked"), "TULIP"),
+    (re.compile(r"return of premium|\brop\b"), "Return of Premium"),
+    (re.compile(r"\bjoint\b"), "Joint Term"),
+    (re.compile(r"increased sum|\bincreased\b"), "Increased Sum Assured"),
+    (re.compile(r"\bpure\b|\bstandard\b"), "Pure Term"),
+)
+
+
+def _first_match(answers, text):
+    for pattern, value in answers:
+        if pattern.search(text):
+            return value
+    return None
+
+
+def _gender(match):
+    return "Female" if match in ("female", "woman") else "Male"
+
+
+def extract_slots(last_bot_message, user_message, profile=None):
+    """
+    Profile slots (smoker, gender, cover_type, policy_type, is_rop) stated in `user_message`,
+    read in the light of the question asked in `last_bot_message` and the slots already in
+    `profile`.
+    """
+    profile = profile or {}
+    text = (user_message or "").strip().lower()
+    asked = (last_bot_message or "").lower()
+    slots = {}
+
+    if NON_SMOKER_ANSWER.search(text):
+        slots["smoker"] = False
+    elif SMOKER_ANSWER.search(text):
+        slots["smoker"] = True
+    elif SMOKER_QUESTION.search(asked):
+        if NO_ANSWER.search(text):
+            slots["smoker"] = False
+        elif YES_ANSWER.search(text):
+            slots["smoker"] = True
+
+    if match := SELF_GENDER_ANSWER.search(text):
+        slots["gender"] = _gender(match.group(3))
+    elif GENDER_QUESTION.search(asked) and (match := BARE_GENDER_ANSWER.search(text)):
+        slots["gender"] = _gender(match.group(1))
+
+    # "Return of premium" answers both questions: the one asked most recently decides
+    cover_asked = max((m.start() for m in COVER_QUESTION.finditer(asked)), default=-1)
+    policy_asked = max((m.start() for m in POLICY_QUESTION.finditer(asked)), default=-1)
+    declined_rop = NO_ROP_ANSWER.search(text)
+    answer = NO_ROP_ANSWER.sub(" ", text)
+    if policy_asked > cover_asked:
+        if policy_type := _first_match(POLICY_TYPE_ANSWERS, answer):
+            slots["policy_type"] = policy_type
+    elif cover_asked >= 0:
+        if cover_type := _first_match(COVER_TYPE_ANSWERS, answer):
+            slots["cover_type"] = cover_type
+
+    # is_rop follows the latest answer: a return of premium pick sets it, turning it down
+    # or picking something else clears it unless the other answer is still return of premium
+    if declined_rop or "cover_type" in slots or "policy_type" in slots:
+        chosen = {**profile, **slots}
+        slots["is_rop"] = not declined_rop and "Return of Premium" in (chosen.get("cover_type"), chosen.get("policy_type"))
+        for slot in ("cover_type", "policy_type"):
+            if declined_rop and chosen.get(slot) == "Return of Premium":
+                slots[slot] = None # Open again
+    return slots
+
+
+def candidate_profiles(profile):
+    """
+    calculate_insurance_plan arguments the conversation can still end with, given the known
+    profile slots: both genders and smoker values unless stated. Empty until age and income
+    are known.
+    """
+    if profile.get("age") is None or profile.get("income") is None:
+        return []
+    genders = [profile["gender"]] if profile.get("gender") else ["Male", "Female"]
+    smokers = [profile["smoker"]] if profile.get("smoker") is not None else [False, True]
+    return [
+        {
+            "age": profile["age"],
+            "income": profile["income"],
+            "liabilities": profile.get("liabilities", 0.0),
+            "smoker": smoker,
+            "gender": gender,
+            "is_rop": profile.get("is_rop", False),
+            "cover_type": profile.get("cover_type") or "Flat",
+            "policy_type": profile.get("policy_type") or "Pure Term",
+        }
+        for gender in genders for smoker in smokers
+    ]
+
+
+class RecommendationPrecomputer:
+    """Fills the recommendation cache with a session's candidate quotes on a background thread."""
+
+    def __init__(self, cache, enabled=True):
+        self.cache = cache
+        self.enabled = enabled and cache.enabled
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="precompute") if self.enabled else None
+
+    def schedule(self, engine, profile):
+        if not self.enabled or engine is None:
+            return
+        candidates = candidate_profiles(profile)
+        if candidates:
+            self._executor.submit(self._run, engine, candidates)
+
+    def _run(self, engine, candidates):
+        try:
+            for user_data in candidates:
+                self.cache.prefetch(engine, user_data)
+        except Exception as e:
+            logger.warning("⚠️ Recommendation precompute failed: %s", e)
+
+
+def create_recommendation_precomputer(cache):
+    """
+    Builds the RecommendationPrecomputer for `cache`, configured by the environment
+    variable RECOMMENDATION_PRECOMPUTE (true | false).
+    """
+    enabled = os.getenv("RECOMMENDATION_PRECOMPUTE", "true").lower() in ("1", "true", "yes")
+    return RecommendationPrecomputer(cache, enabled=enabled)
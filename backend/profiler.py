@@ -0,0 +1,180 @@
+import datetime
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Opt-in sampling profiler for live chat turns. A profiled turn registers the threads it
+# runs on; one shared sampler thread wakes every `interval` seconds, reads those threads'
+# Python stacks (sys._current_frames) and counts them. The turn never pays for more than
+# the registration, and the sampler sleeps while nothing is profiled. Each profile is
+# written as collapsed stacks ("frame;frame;frame count" lines), the input of
+# flamegraph.pl and speedscope.
+
+
+class Profile:
+    """Stack samples of one chat turn."""
+
+    def __init__(self, session):
+        self.session = session
+        self.stacks = {} # collapsed stack -> samples
+        self.started = time.perf_counter()
+        self.threads = set()
+        self.finished = False # Set (under the profiler lock) once no more samples are taken
+
+
+class RequestProfiler:
+    def __init__(self, directory, sample_rate=0.0, allow_header=False, interval=0.005, max_concurrent=4):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.allow_header = allow_header
+        self.interval = interval
+        self.max_concurrent = max_concurrent
+
+        self._active = {} # thread ident -> Profile
+        self._profiles = 0 # Profiles in progress
+        self._labels = {} # code object -> frame label
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or self.allow_header
+
+    def wanted(self, header=None):
+        """Whether to profile a request: sampled at `sample_rate`, or asked for by the X-Profile header."""
+        if self.allow_header and header and header.lower() in ("1", "true", "yes"):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def sample(self, wanted, session):
+        """Profiles the calling thread for the `with` block (a no-op unless `wanted`)."""
+        profile = self._begin(session) if wanted else None
+        if profile is None:
+            yield None
+            return
+        try:
+            with self.attach(profile):
+                yield profile
+        finally:
+            self._finish(profile)
+
+    @contextmanager
+    def attach(self, profile):
+        """Adds the calling thread to `profile` (e.g. a hedged attempt on another thread)."""
+        if profile is None:
+            yield
+            return
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = profile
+            profile.threads.add(ident)
+        self._wake.set()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self._active.get(ident) is profile:
+                    del self._active[ident]
+
+    def current(self):
+        """The profile the calling thread is part of, if any."""
+        return self._active.get(threading.get_ident())
+
+    def _begin(self, session):
+        with self._lock:
+            # Bounded so enabling profiling under load cannot pile up samplers' work
+            if self._profiles >= self.max_concurrent:
+                return None
+            self._profiles += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        return Profile(session)
+
+    def _finish(self, profile):
+        with self._lock:
+            self._profiles -= 1
+            # Threads still attached (a hedged attempt that lost the race) stop counting here
+            for ident in profile.threads:
+                if self._active.get(ident) is profile:
+                    del self._active[ident]
+            profile.finished = True
+            stacks = dict(profile.stacks)
+        try:
+            self._write(profile, stacks)
+        except Exception as e:
+            logger.warning("⚠️ Failed to write request profile: %s", e)
+
+    # --- Sampler thread ---
+
+    def _run(self):
+        while True:
+            if not self._active:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            time.sleep(self.interval)
+
+            frames = sys._current_frames()
+            with self._lock:
+                targets = list(self._active.items())
+            samples = [(profile, self._collapse(frames[ident])) for ident, profile in targets if ident in frames]
+            del frames
+            # Counted under the lock: _finish snapshots the stacks and closes the profile
+            with self._lock:
+                for profile, stack in samples:
+                    if not profile.finished:
+                        profile.stacks[stack] = profile.stacks.get(stack, 0) + 1
+
+    def _collapse(self, frame):
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+            labels.append(label)
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+    def _write(self, profile, stacks):
+        session = profile.session
+        elapsed_ms = round((time.perf_counter() - profile.started) * 1000)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        tags = [stamp, session.session_id[:12], session.model_name or "none", f"{elapsed_ms}ms"]
+        name = "-".join(re.sub(r"[^A-Za-z0-9.]+", "_", str(tag)) for tag in tags) + ".collapsed"
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            for stack, count in sorted(stacks.items()):
+                f.write(f"{stack} {count}\n")
+        logger.info("🔬 Request profile written to %s (%d samples)", path, sum(stacks.values()))
+
+
+def create_request_profiler():
+    """
+    Builds the RequestProfiler configured by environment variables:
+    PROFILE_SAMPLE_RATE, PROFILE_ALLOW_HEADER, PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_MAX_CONCURRENT.
+    """
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    profiler = RequestProfiler(
+        os.getenv("PROFILE_DIR", os.path.join(base_path, "logs", "profiles")),
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+        allow_header=os.getenv("PROFILE_ALLOW_HEADER", "false").lower() in ("1", "true", "yes"),
+        interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+        max_concurrent=int(os.getenv("PROFILE_MAX_CONCURRENT", "4")),
+    )
+    if profiler.enabled:
+        logger.info("🔬 Request profiling on (sample rate %s, header %s) -> %s", profiler.sample_rate, "allowed" if profiler.allow_header else "ignored", profiler.directory)
+    return profiler
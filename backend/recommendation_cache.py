@@ -0,0 +1,143 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import RECOMMENDATION_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# get_recommendation is deterministic given the profile and the engine's data, so quotes are
+# cached per (data version, canonical profile). Free-text fields are reduced to what the
+# engine actually reads from them (premium factors and policy category), so "female" and
+# "Female", or "Term" and "Pure Term", share an entry; numerics are kept exact.
+
+
+def canonical_profile(user_data):
+    """
+    Hashable cache key part for a get_recommendation profile, or None if the profile is
+    malformed (left to the engine to report).
+    """
+    from logic import normalise_policy_type, premium_type_factors # Deferred: logic imports NumPy
+
+    try:
+        age = int(user_data.get('age', 30))
+        income = float(user_data.get('income', 1000000))
+        liabilities = float(user_data.get('liabilities', 0))
+    except (TypeError, ValueError):
+        return None
+    smoker = bool(user_data.get('smoker', False))
+    is_rop = bool(user_data.get('is_rop', False))
+    female = str(user_data.get('gender', 'Male')).lower() == "female"
+    cover_type = str(user_data.get('cover_type', 'Flat'))
+    policy_type = str(user_data.get('policy_type', 'Pure Term'))
+    return (
+        age, income, liabilities, smoker, is_rop, female,
+        premium_type_factors(cover_type, policy_type), normalise_policy_type(policy_type),
+    )
+
+
+class RecommendationCache:
+    """
+    Bounded LRU of get_recommendation results with TTL expiry. Entries are keyed on the
+    engine's data version, so a reloaded engine never sees results of the old data.
+    Cached results are shared: callers get a shallow copy and must not mutate nested values.
+    """
+
+    def __init__(self, max_entries=5000, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict() # key -> (stored_at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetches = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get_recommendation(self, engine, user_data, compute=None):
+        """
+        engine.get_recommendation(user_data), answered from the cache when possible. On a miss
+        the result comes from `compute(user_data)` if given (an equivalent of the engine call).
+        """
+        compute = compute or engine.get_recommendation
+        profile = canonical_profile(user_data) if self.enabled else None
+        if profile is None:
+            return compute(user_data)
+
+        key = (engine.data_version, profile)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                RECOMMENDATION_CACHE_LOOKUPS.labels("hit").inc()
+                return dict(entry[1])
+            self.misses += 1
+        RECOMMENDATION_CACHE_LOOKUPS.labels("miss").inc()
+        return dict(self._compute(compute, user_data, key, now))
+
+    def prefetch(self, engine, user_data):
+        """Computes and caches the result for `user_data` ahead of its lookup (not counted as one)."""
+        profile = canonical_profile(user_data) if self.enabled else None
+        if profile is None:
+            return
+        key = (engine.data_version, profile)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                return
+            self.prefetches += 1
+        self._compute(engine.get_recommendation, user_data, key, now)
+
+    def _compute(self, compute, user_data, key, now):
+        result = compute(user_data)
+        if "error" in result:
+            return result # Not cached: data problems should surface on every call
+
+        with self._lock:
+            self._entries[key] = (now, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def clear(self):
+        """Drops every entry, e.g. after the engine data was reloaded."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "prefetches": self.prefetches,
+            }
+
+
+def create_recommendation_cache():
+    """
+    Builds the RecommendationCache configured by environment variables:
+    RECOMMENDATION_CACHE_MAX_ENTRIES (0 disables), RECOMMENDATION_CACHE_TTL_SECONDS.
+    """
+    cache = RecommendationCache(
+        max_entries=int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "5000")),
+        ttl_seconds=float(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", "3600")),
+    )
+    if cache.enabled:
+        logger.info("✅ Recommendation cache ready (%d entries, TTL %ss)", cache.max_entries, cache.ttl_seconds)
+    return cache
@@ -0,0 +1,286 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Session ids are generated server-side (uuid4 hex); anything else is rejected
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ConversationSession:
+    """
+    Server-side state of one conversation.
+    `history`, `profile` and `tool_results` are persisted by the backend;
+    `chat` (the live Gemini ChatSession) and `last_query` (the RecommendationQuery of the
+    last plan, re-ranked when only a preference changes) only ever live in memory.
+    """
+
+    def __init__(self, session_id, history=None, profile=None, tool_results=None, eligibility=None, created_at=None, updated_at=None):
+        self.session_id = session_id
+        self.history = history or [] # [{"role": "user" | "model", "content": str}]
+        self.profile = profile or {} # Profile slots extracted from tool arguments
+        self.tool_results = tool_results or [] # [{"tool": name, "args": {...}, "result": {...}}]
+        self.eligibility = eligibility or [] # Eligibility verdicts already raised (see eligibility.py)
+        self.created_at = created_at or time.time()
+        self.updated_at = updated_at or self.created_at
+
+        # Live chat object, reused across turns while the session stays in memory
+        self.chat = None
+        self.model_name = None
+        self.last_query = None
+
+        # One turn at a time per session
+        self.lock = threading.Lock()
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "history": self.history,
+            "profile": self.profile,
+            "tool_results": self.tool_results,
+            "eligibility": self.eligibility,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data["session_id"],
+            history=data.get("history"),
+            profile=data.get("profile"),
+            tool_results=data.get("tool_results"),
+            eligibility=data.get("eligibility"),
+            created_at=data.get("created_at"),
+            updated_at=data.get("updated_at"),
+        )
+
+
+# --- PERSISTENCE BACKENDS ---
+
+class MemorySessionBackend:
+    """No persistence: sessions live only in the in-memory LRU."""
+
+    def load(self, session_id):
+        return None
+
+    def save(self, session):
+        pass
+
+    def delete(self, session_id):
+        pass
+
+    def purge_expired(self, cutoff):
+        pass
+
+
+class FileSessionBackend:
+    """One JSON file per session in `directory`."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def load(self, session_id):
+        try:
+            with open(self._path(session_id), "r", encoding="utf-8") as f:
+                return ConversationSession.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def save(self, session):
+        # Write-then-rename so a crash never leaves a half-written session
+        tmp_path = self._path(session.session_id) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(session.to_dict(), f)
+        os.replace(tmp_path, self._path(session.session_id))
+
+    def delete(self, session_id):
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def purge_expired(self, cutoff):
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith(".json") and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass # Purged by another worker meanwhile
+
+
+class SQLiteSessionBackend:
+    """All sessions in one SQLite table."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Workers sharing the database wait for each other's writes instead of failing
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return ConversationSession.from_dict(json.loads(row[0])) if row else None
+
+    def save(self, session):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session.session_id, json.dumps(session.to_dict()), session.updated_at),
+            )
+            self._conn.commit()
+
+    def delete(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def purge_expired(self, cutoff):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+            self._conn.commit()
+
+
+# --- STORE ---
+
+class SessionStore:
+    """
+    In-memory LRU of live sessions with TTL expiry, in front of a persistence backend.
+    Sessions evicted from memory can be reloaded from the backend (without their live chat).
+    With `shared` (a file / sqlite backend used by several worker processes) every get reads
+    the stored session: the in-memory copy and its live chat are kept only while no other
+    process has saved a newer version.
+    """
+
+    def __init__(self, backend=None, max_sessions=1000, ttl_seconds=7200, shared=False, purge_interval=600):
+        self.backend = backend or MemorySessionBackend()
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.purge_interval = purge_interval # 0 disables start_purging()
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _is_expired(self, session, now):
+        return now - session.updated_at > self.ttl_seconds
+
+    def _remember(self, session):
+        # Caller holds self._lock
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def create(self, history=None):
+        session = ConversationSession(uuid.uuid4().hex, history=history)
+        with self._lock:
+            self._remember(session)
+        return session
+
+    def get(self, session_id):
+        if not session_id or not SESSION_ID_PATTERN.match(session_id):
+            return None
+
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                if self._is_expired(session, now):
+                    del self._sessions[session_id]
+                    session = None
+                else:
+                    self._sessions.move_to_end(session_id)
+                    if not self.shared:
+                        return session
+
+        stored = self.backend.load(session_id)
+        if stored is None:
+            return session # Not saved yet (or no persistence)
+        if self._is_expired(stored, now):
+            self.backend.delete(session_id)
+            return None
+
+        with self._lock:
+            # Keep a single live object unless another process saved a newer version
+            existing = self._sessions.get(session_id)
+            if existing is not None and existing.updated_at >= stored.updated_at:
+                return existing
+            self._remember(stored)
+        return stored
+
+    def save(self, session):
+        session.updated_at = time.time()
+        self.backend.save(session)
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [sid for sid, s in self._sessions.items() if s.updated_at < cutoff]
+            for session_id in expired:
+                del self._sessions[session_id]
+        self.backend.purge_expired(cutoff)
+        return len(expired)
+
+    def start_purging(self):
+        """Purges expired sessions (memory and backend) every `purge_interval` seconds on a background thread."""
+        if self.purge_interval <= 0:
+            return
+        threading.Thread(target=self._purge_loop, name="session-purge", daemon=True).start()
+        logger.info("🧹 Purging expired sessions every %ss", self.purge_interval)
+
+    def _purge_loop(self):
+        while True:
+            time.sleep(self.purge_interval)
+            try:
+                purged = self.purge_expired()
+                if purged:
+                    logger.info("🧹 Purged %d expired session(s) from memory", purged)
+            except Exception as e:
+                logger.exception("❌ Session purge failed: %s", e)
+
+
+def create_session_store():
+    """
+    Builds the SessionStore configured by environment variables:
+    SESSION_BACKEND (memory | file | sqlite), SESSION_PATH, SESSION_MAX_ENTRIES, SESSION_TTL_SECONDS,
+    SESSION_PURGE_INTERVAL_SECONDS, SESSION_SHARED (set by gunicorn.conf.py when several workers
+    share the backend).
+    """
+    backend_name = os.getenv("SESSION_BACKEND", "memory").lower()
+    base_path = os.path.dirname(os.path.abspath(__file__))
+
+    if backend_name == "file":
+        backend = FileSessionBackend(os.getenv("SESSION_PATH", os.path.join(base_path, "sessions")))
+    elif backend_name == "sqlite":
+        backend = SQLiteSessionBackend(os.getenv("SESSION_PATH", os.path.join(base_path, "sessions.sqlite3")))
+    else:
+        backend = MemorySessionBackend()
+    shared = os.getenv("SESSION_SHARED", "false").lower() in ("1", "true", "yes")
+    if shared and isinstance(backend, MemorySessionBackend):
+        raise RuntimeError("SESSION_SHARED needs a file or sqlite SESSION_BACKEND: memory sessions cannot be shared between workers")
+
+    logger.info("✅ Session store ready (%s backend%s)", backend_name, ", shared" if shared else "")
+    return SessionStore(
+        backend=backend,
+        max_sessions=int(os.getenv("SESSION_MAX_ENTRIES", "1000")),
+        ttl_seconds=int(os.getenv("SESSION_TTL_SECONDS", "7200")),
+        shared=shared,
+        purge_interval=float(os.getenv("SESSION_PURGE_INTERVAL_SECONDS", "600")),
+    )
@@ -0,0 +1,49 @@
+"""
+Offline equivalence checks of the vectorized InsuranceEngine.get_recommendations_batch:
+every row must equal what the scalar get_recommendation returns for that profile. Needs
+only the data files, no server or API key.
+
+Usage:
+    python -m pytest -q test_batch_recommendations.py
+"""
+import os
+
+os.environ.setdefault("ENGINE_SNAPSHOT", "false")
+
+import pytest
+
+import bench_suite
+from logic import InsuranceEngine, RecommendationQuery
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return InsuranceEngine(snapshot="false")
+
+
+def test_batch_matches_scalar(engine):
+    profiles = bench_suite.profile_grid()
+    assert engine.get_recommendations_batch(profiles) == [engine.get_recommendation(p) for p in profiles]
+
+
+@pytest.mark.parametrize("top_k", [1, 5, 50])
+def test_batch_top_k_matches_rerank(engine, top_k):
+    profiles = bench_suite.profile_grid()[::11]
+    for profile, result in zip(profiles, engine.get_recommendations_batch(profiles, top_k=top_k)):
+        assert len(result["recommendations"]) <= top_k
+        assert result == RecommendationQuery(engine, profile).rerank(top_k=top_k)
+
+
+def test_batch_dataframe_and_partial_profiles(engine):
+    pd = pytest.importorskip("pandas")
+    profiles = [{"age": 30}, {"income": 400000, "policy_type": "TULIP"}, {"age": 70, "income": 2e6}, {}]
+    frame = pd.DataFrame(profiles)
+    expected = [engine.get_recommendation(p) for p in profiles]
+    assert engine.get_recommendations_batch(profiles) == expected
+    assert engine.get_recommendations_batch(frame) == expected
+
+
+def test_batch_bad_row_only_fails_itself(engine):
+    results = engine.get_recommendations_batch([{"age": "x"}, {"age": 30}])
+    assert "error" in results[0]
+    assert results[1] == engine.get_recommendation({"age": 30})
@@ -0,0 +1,53 @@
+"""
+Offline checks of the eligibility pre-screen (eligibility.EligibilityScreener) against the
+bundled eligibility CSV: first-person disclosures must be flagged, mentions about someone
+else and negated ones must not.
+
+Usage:
+    python -m pytest -q test_eligibility.py
+"""
+import pytest
+
+from eligibility import EligibilityScreener, extract_ages
+
+
+@pytest.fixture(scope="module")
+def screener():
+    screener = EligibilityScreener.from_csv()
+    assert screener.rules
+    return screener
+
+
+def conditions(screener, message):
+    return {v["condition"].lower() for v in screener.screen(message)}
+
+
+@pytest.mark.parametrize("message", [
+    "I have cancer",
+    "I have cancer and they are treating me",
+    "I was diagnosed with cancer, my family is supporting me",
+    "He said I have cancer",
+    "my wife and I have cancer",
+])
+def test_first_person_disclosure_is_flagged(screener, message):
+    assert any("cancer" in c for c in conditions(screener, message)), message
+
+
+@pytest.mark.parametrize("message", [
+    "My father has cancer",
+    "his cancer was treated last year",
+    "I am healthy but my mother had cancer",
+    "I don't have cancer",
+    "no cancer in my history",
+])
+def test_third_party_or_negated_mention_is_not_flagged(screener, message):
+    assert not any("cancer" in c for c in conditions(screener, message)), message
+
+
+def test_heat_stroke_is_not_a_stroke(screener):
+    assert not any("stroke" in c for c in conditions(screener, "I got a heat stroke last summer"))
+
+
+def test_ages_about_someone_else_are_ignored():
+    assert extract_ages("I am 30 years old and my son is 5 years old") == [30]
+    assert extract_ages("my father is 70 years old") == []
@@ -0,0 +1,59 @@
+"""
+Offline checks of the template fast path (intent_router.route_intent): which turns are
+answered from the pre-rendered option lists and which must go to the model.
+
+Usage:
+    python -m pytest -q test_intent_router.py
+"""
+import pytest
+
+from intent_router import COVER_TYPE_INTENT, POLICY_TYPE_INTENT, product_mention_pattern, route_intent
+
+COVER_ASKED = "Great, thanks! 😊 👉 **What type of cover are you looking for?** (Flat, Increasing, ROP, etc.)"
+POLICY_ASKED = "Noted! 👉 **Which type of term life policy** are you looking for? 📑"
+# A plan summary that mentions the cover type without asking for it
+RECOMMENDATION = (
+    "Here are your top plans for a Flat cover type 🛡️:\n1. HDFC Life Click 2 Protect Supreme\n"
+    "2. ICICI Prudential iProtect Smart\nWould you like to know anything else?"
+)
+PRODUCT_MENTION = product_mention_pattern([
+    ("HDFC Life", True), ("ICICI Prudential", True), ("Click 2 Protect Supreme", False),
+])
+
+
+@pytest.mark.parametrize("bot, user, intent", [
+    (COVER_ASKED, "I don't know", COVER_TYPE_INTENT),
+    (COVER_ASKED, "not sure, what are the options?", COVER_TYPE_INTENT),
+    (POLICY_ASKED, "idk", POLICY_TYPE_INTENT),
+    (POLICY_ASKED, "help me choose", POLICY_TYPE_INTENT),
+    (RECOMMENDATION, "What are the different types of cover?", COVER_TYPE_INTENT),
+    (None, "what are the types of term life policies", POLICY_TYPE_INTENT),
+])
+def test_routes_to_template(bot, user, intent):
+    assert route_intent(bot, user, PRODUCT_MENTION) == intent
+
+
+@pytest.mark.parametrize("user", [
+    "tell me more about HDFC",
+    "explain the premium",
+    "which is better for a home loan, flat or decreasing?",
+    "not sure about hdfc",
+    "I don't know",
+])
+def test_recommendation_mentioning_cover_type_goes_to_model(user):
+    assert route_intent(RECOMMENDATION, user, PRODUCT_MENTION) is None
+
+
+@pytest.mark.parametrize("user", [
+    "Increasing I think, but not sure",
+    "not sure, maybe return of premium?",
+    "no idea, is click 2 protect supreme good?",
+    "not sure about icici prudential",
+])
+def test_answer_naming_an_option_or_product_goes_to_model(user):
+    assert route_intent(COVER_ASKED, user, PRODUCT_MENTION) is None
+
+
+def test_question_not_at_the_end_is_ignored():
+    bot = "What type of cover are you looking for? Before that, please confirm your age."
+    assert route_intent(bot, "I don't know", PRODUCT_MENTION) is None
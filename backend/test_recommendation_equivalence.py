@@ -0,0 +1,66 @@
+"""
+Offline equivalence checks: the fast recommendation paths (RecommendationQuery re-ranking,
+the what-if comparison and the recommendation cache) must return exactly what the scalar
+InsuranceEngine.get_recommendation returns. Needs only the data files, no server or API key.
+The vectorized batch is checked in test_batch_recommendations.py.
+
+Usage:
+    python -m pytest -q test_recommendation_equivalence.py
+"""
+import itertools
+import os
+
+os.environ.setdefault("ENGINE_SNAPSHOT", "false")
+
+import pytest
+
+import bench_suite
+from logic import RERANK_FIELDS, InsuranceEngine, RecommendationQuery
+from recommendation_cache import RecommendationCache
+
+COVER_TYPES = ["Flat", "Increasing", "Decreasing", "Return of Premium", "zero cost"]
+POLICY_TYPES = ["Pure Term", "Return of Premium", "TULIP", "Joint Term", "Increased Sum Assured"]
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return InsuranceEngine(snapshot="false")
+
+
+@pytest.fixture(scope="module")
+def profiles():
+    return bench_suite.profile_grid()[::5]
+
+
+def preference_changes():
+    for smoker, is_rop, cover_type, policy_type in itertools.product([False, True], [False, True], COVER_TYPES, POLICY_TYPES):
+        yield dict(zip(RERANK_FIELDS, (smoker, is_rop, cover_type, policy_type)))
+
+
+def test_rerank_matches_scalar(engine, profiles):
+    for profile in profiles:
+        query = RecommendationQuery(engine, profile)
+        for changes in preference_changes():
+            assert query.rerank(changes) == engine.get_recommendation({**profile, **changes}), (profile, changes)
+
+
+def test_compare_matches_scalar(engine, profiles):
+    alternatives = list(preference_changes())[::7]
+    for profile in profiles[::4]:
+        result = RecommendationQuery(engine, profile).compare(alternatives)
+        assert result["base"] == engine.get_recommendation(profile)
+        for alternative, changes in zip(result["alternatives"], alternatives):
+            expected = engine.get_recommendation({**profile, **changes})
+            assert alternative == {"changes": changes, **expected}, (profile, changes)
+
+
+def test_cache_matches_scalar(engine, profiles):
+    cache = RecommendationCache(max_entries=100000)
+    variants = list(itertools.product(["Male", "female", "FEMALE"], ["Flat", "increasing cover"], ["Pure Term", "Term", "return of premium plan"]))
+    for profile in profiles[::3]:
+        for gender, cover_type, policy_type in variants:
+            user_data = dict(profile, gender=gender, cover_type=cover_type, policy_type=policy_type)
+            expected = engine.get_recommendation(dict(user_data))
+            assert cache.get_recommendation(engine, dict(user_data)) == expected # Miss
+            assert cache.get_recommendation(engine, dict(user_data)) == expected # Hit
+    assert cache.hits and cache.misses
@@ -0,0 +1,174 @@
+import contextvars
+import datetime
+import logging
+from contextlib import contextmanager
+
+from metrics import TOOL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Tool functions exposed to Gemini. They are module-level so a GenerativeModel (and its
+# tool declarations) can be built once and shared by every request; the per-turn state
+# they need is read from the TurnContext bound to the current thread.
+
+
+class TurnCancelled(Exception):
+    """Raised by a tool of a hedged attempt that lost the race, ending its model calls early."""
+
+
+class TurnContext:
+    """
+    State of one chat turn as seen by the tools: the engine to query (through the
+    recommendation cache, if any) and the tool calls / profile slots recorded during the
+    turn (committed to the session afterwards).
+    """
+
+    def __init__(self, engine, session=None, recommendation_cache=None):
+        self.engine = engine
+        self.session = session
+        self.recommendation_cache = recommendation_cache
+        self.tool_results = [] # [{"tool": name, "args": {...}, "result": {...}}]
+        self.profile = {} # Profile slots taken from tool arguments
+        self.last_query = None # RecommendationQuery started during the turn
+        self.cancelled = False # Set on a hedged attempt that lost the race
+
+    def merge(self, other):
+        """Adopts the tool calls recorded by another context (the winning hedged attempt)."""
+        self.tool_results.extend(other.tool_results)
+        self.profile.update(other.profile)
+        self.last_query = other.last_query or self.last_query
+
+    def record(self, tool, args, result, profile_updates):
+        self.tool_results.append({"tool": tool, "args": args, "result": result})
+        self.profile.update(profile_updates)
+
+    def get_recommendation(self, user_data):
+        if self.recommendation_cache is None:
+            return self.compute_recommendation(user_data)
+        return self.recommendation_cache.get_recommendation(self.engine, user_data, self.compute_recommendation)
+
+    def compute_recommendation(self, user_data):
+        """
+        Re-ranks the session's last query when only a preference (RERANK_FIELDS) changed,
+        otherwise starts a new query, kept on the turn until it is committed to the session.
+        """
+        from logic import RecommendationQuery # Deferred: logic imports NumPy
+
+        query = self.last_query or (self.session.last_query if self.session is not None else None)
+        if query is None or not query.accepts(self.engine, user_data):
+            if not self.engine.claims:
+                return self.engine.get_recommendation(user_data) # Reports the data problem
+            try:
+                query = RecommendationQuery(self.engine, user_data)
+            except (TypeError, ValueError):
+                return self.engine.get_recommendation(user_data) # Reports the bad argument
+            self.last_query = query
+        return query.rerank(user_data)
+
+    def plan_outputs(self):
+        return [r["result"] for r in self.tool_results if r["tool"] == "calculate_insurance_plan"]
+
+
+_current_turn = contextvars.ContextVar("current_turn")
+
+
+@contextmanager
+def bind_turn(turn):
+    """Makes `turn` the context the tool functions use in this thread / task."""
+    token = _current_turn.set(turn)
+    try:
+        yield turn
+    finally:
+        _current_turn.reset(token)
+
+
+def current_turn():
+    return _current_turn.get()
+
+
+def calculate_recommended_cover(income: float, dob: str = None, liabilities: float = 0.0, assets: float = 0.0, age_override: int = None):
+    """
+    Calculates the recommended life insurance cover (Sum Assured).
+    CRITICAL: You MUST provide `dob` in 'YYYY-MM-DD' format.
+    If `dob` is missing, you must provide `age_override`.
+    """
+    logger.info("🛠️ Tool Triggered: calculate_recommended_cover")
+    logger.debug("Tool args: Income=%s, DOB=%s, AgeOverride=%s", income, dob, age_override)
+    turn = current_turn()
+    if turn.cancelled:
+        raise TurnCancelled("Hedged attempt lost the race")
+    
+    final_age = None
+
+    # 1. Try to calculate from DOB (Preferred)
+    if dob:
+        try:
+            dob_date = datetime.datetime.strptime(dob, "%Y-%m-%d").date()
+            today = datetime.date.today()
+            final_age = today.year - dob_date.year - ((today.month, today.day) < (dob_date.month, dob_date.day))
+            logger.debug("    ✅ Calculated Exact Age from DOB (%s) -> %s years", dob, final_age)
+        except Exception as e:
+            logger.warning("    ⚠️ Error parsing DOB: %s", e)
+    
+    # 2. Fallback to age_override
+    if final_age is None:
+        if age_override is not None:
+            logger.info("    ⚠️ Using provided age_override")
+            final_age = age_override
+        else:
+            return {"error": "CRITICAL: Could not determine Age. Please provide valid DOB (YYYY-MM-DD)."}
+
+    try:
+        with TOOL_SECONDS.labels("calculate_recommended_cover").time():
+            cover = turn.engine.calculate_needs(income=income, liabilities=liabilities, age=final_age, assets=assets)
+        result = {
+            "recommended_cover": cover, 
+            "calculated_age": final_age  # Return this so the bot knows the TRUE age
+        }
+        turn.record(
+            "calculate_recommended_cover",
+            {"income": income, "dob": dob, "liabilities": liabilities, "assets": assets, "age_override": age_override},
+            result,
+            {"age": final_age, "income": income, "liabilities": liabilities, "assets": assets},
+        )
+        return result
+    except Exception as e:
+        logger.exception("❌ Error inside calculate_recommended_cover: %s", e)
+        return {"error": "Calculation failed"}
+
+
+def calculate_insurance_plan(age: int, income: float, smoker: bool, gender: str, liabilities: float = 0.0, is_rop: bool = False, cover_type: str = "Flat", policy_type: str = "Pure Term"):
+    """
+    Calculates best term insurance plans. Use this ONLY after gathering all detailed profile info (Age, Income, Smoker, Gender, Cover Type, Policy Type, etc.).
+    """
+    logger.info("🛠️ Tool Triggered: calculate_insurance_plan")
+    logger.debug("Tool args: Age=%s, Income=%s, Gender=%s, Smoker=%s, CoverType=%s, PolicyType=%s", age, income, gender, smoker, cover_type, policy_type)
+    turn = current_turn()
+    if turn.cancelled:
+        raise TurnCancelled("Hedged attempt lost the race")
+    
+    user_data = {
+        "age": age,
+        "income": income,
+        "liabilities": liabilities,
+        "smoker": smoker,
+        "gender": gender,
+        "is_rop": is_rop,
+        "cover_type": cover_type,
+        "policy_type": policy_type
+    }
+    
+    # Run the logic
+    try:
+        with TOOL_SECONDS.labels("calculate_insurance_plan").time():
+            result = turn.get_recommendation(user_data)
+        # CAPTURE THE RESULT
+        turn.record("calculate_insurance_plan", user_data, result, user_data)
+        return result
+    except Exception as e:
+        logger.exception("❌ Error inside tool execution: %s", e)
+        return {"error": "Calculation failed"}
+
+
+TOOLS = [calculate_recommended_cover, calculate_insurance_plan]
+TOOL_FUNCTIONS = {fn.__name__: fn for fn in TOOLS}
@@ -8,16 +8,19 @@ interface ChatMessage {
 }
 
 interface ChatRequest {
-  messages: ChatMessage[]
+  session_id?: string | null
+  message?: string
+  messages?: ChatMessage[]
 }
 
 export async function POST(request: NextRequest) {
   try {
     const body: ChatRequest = await request.json()
 
-    if (!body.messages || !Array.isArray(body.messages)) {
+    // Session mode sends only the new message; legacy clients send the full history
+    if (typeof body.message !== 'string' && (!body.messages || !Array.isArray(body.messages))) {
       return NextResponse.json(
-        { error: 'Messages array is required' },
+        { error: 'A message or messages array is required' },
         { status: 400 }
       )
     }
@@ -28,6 +31,8 @@ export async function POST(request: NextRequest) {
         'Content-Type': 'application/json',
       },
       body: JSON.stringify({
+        session_id: body.session_id ?? null,
+        message: body.message,
         messages: body.messages,
       }),
     })
@@ -39,6 +44,8 @@ export async function POST(request: NextRequest) {
     const data = await response.json()
 
     return NextResponse.json({
+      session_id: data.session_id || null,
+      session_expired: data.session_expired || false,
       response: data.response || '',
       recommendations: data.recommendations || null,
       analysis: data.analysis || null,
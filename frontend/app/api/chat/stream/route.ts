@@ -0,0 +1,63 @@
+import { NextRequest, NextResponse } from 'next/server'
+
+const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://127.0.0.1:8000'
+
+interface ChatMessage {
+  role: 'user' | 'model'
+  content: string
+}
+
+interface ChatRequest {
+  session_id?: string | null
+  message?: string
+  messages?: ChatMessage[]
+}
+
+// Proxies the backend's server-sent events stream (/chat/stream) without buffering
+export async function POST(request: NextRequest) {
+  try {
+    const body: ChatRequest = await request.json()
+
+    // Session mode sends only the new message; legacy clients send the full history
+    if (typeof body.message !== 'string' && (!body.messages || !Array.isArray(body.messages))) {
+      return NextResponse.json(
+        { error: 'A message or messages array is required' },
+        { status: 400 }
+      )
+    }
+
+    const response = await fetch(`${BACKEND_URL}/chat/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        session_id: body.session_id ?? null,
+        message: body.message,
+        messages: body.messages,
+      }),
+    })
+
+    if (!response.ok || !response.body) {
+      throw new Error(`Backend returned ${response.status}`)
+    }
+
+    return new Response(response.body, {
+      headers: {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        Connection: 'keep-alive',
+      },
+    })
+  } catch (error) {
+    console.error('API error:', error)
+    return NextResponse.json(
+      {
+        error: 'Failed to process chat message',
+        response:
+          'I apologize for the technical difficulty. Please ensure the backend server is running.',
+      },
+      { status: 500 }
+    )
+  }
+}
@@ -24,6 +24,7 @@ export default function ChatPage() {
     sendMessage,
     recommendations,
     loadingIndicator,
+    isStreaming,
   } = useChatBot()
 
   const {
@@ -33,7 +34,8 @@ export default function ChatPage() {
   } = useSpeech()
 
   const scrollToBottom = () => {
-    messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
+    // Jump instantly while tokens stream in; smooth scrolling every chunk lags behind
+    messagesEndRef.current?.scrollIntoView({ behavior: isStreaming ? 'auto' : 'smooth' })
   }
 
   useEffect(() => {
@@ -141,7 +143,7 @@ export default function ChatPage() {
                   key={idx}
                   role={msg.role}
                   content={msg.content}
-                  onSpeak={() => !isMuted && speak(msg.content)}
+                  onSpeak={isStreaming && idx === messages.length - 1 ? undefined : () => !isMuted && speak(msg.content)}
                   isSpeaking={isSpeaking}
                   onStopSpeak={stopSpeaking}
                 />
@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useCallback } from 'react'
+import { useState, useCallback, useRef } from 'react'
 import { toast } from 'sonner'
 
 export interface Message {
@@ -17,10 +17,43 @@ export interface Recommendation {
   usp: string
 }
 
+type StreamEventHandler = (event: string, data: any) => void
+
+// Reads a text/event-stream body and calls onEvent for every complete event
+async function readEventStream(body: ReadableStream<Uint8Array>, onEvent: StreamEventHandler) {
+  const reader = body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary !== -1) {
+      const rawEvent = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      boundary = buffer.indexOf('\n\n')
+
+      let event = 'message'
+      let data = ''
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data += line.slice(5).trim()
+      }
+      if (data) onEvent(event, JSON.parse(data))
+    }
+  }
+}
+
 export function useChatBot() {
   const [messages, setMessages] = useState<Message[]>([])
   const [recommendations, setRecommendations] = useState<Recommendation[] | null>(null)
   const [loadingIndicator, setLoadingIndicator] = useState(false)
+  const [isStreaming, setIsStreaming] = useState(false)
+  // Server-side session: after the first turn only the new message is sent
+  const sessionIdRef = useRef<string | null>(null)
 
   const sendMessage = useCallback(async (userMessage: string) => {
     if (!userMessage.trim()) return
@@ -29,42 +62,60 @@ export function useChatBot() {
     setMessages((prev) => [...prev, newUserMessage])
     setLoadingIndicator(true)
 
-    try {
-      const messagesForAPI = [
-        ...messages,
-        newUserMessage,
-      ]
+    // The bot reply is appended on the first streamed token and then grown in place
+    let replyStarted = false
+    const updateReply = (update: (content: string) => string) => {
+      if (!replyStarted) {
+        replyStarted = true
+        setLoadingIndicator(false)
+        setIsStreaming(true)
+        setMessages((prev) => [...prev, { role: 'model', content: update('') }])
+        return
+      }
+      setMessages((prev) => {
+        const last = prev[prev.length - 1]
+        return [...prev.slice(0, -1), { ...last, content: update(last.content) }]
+      })
+    }
 
-      const response = await fetch('/api/chat', {
+    try {
+      const response = await fetch('/api/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-          messages: messagesForAPI.map((msg) => ({
-            role: msg.role,
-            content: msg.content,
-          })),
+          session_id: sessionIdRef.current,
+          message: userMessage,
         }),
       })
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to send message')
       }
 
-      const data = await response.json()
-      const aiResponse = data.response || ''
-
-      const newAiMessage: Message = {
-        role: 'model',
-        content: aiResponse,
-      }
-      setMessages((prev) => [...prev, newAiMessage])
-
-      if (data.recommendations) {
-        setRecommendations(data.recommendations)
-        toast.success('Insurance plans personalized for you!')
-      }
+      await readEventStream(response.body, (event, data) => {
+        if (event === 'token') {
+          updateReply((content) => content + data.text)
+        } else if (event === 'recommendations') {
+          if (data.recommendations) {
+            setRecommendations(data.recommendations)
+            toast.success('Insurance plans personalized for you!')
+          }
+        } else if (event === 'done') {
+          sessionIdRef.current = data.session_id || sessionIdRef.current
+          if (data.session_expired) {
+            toast.info('Your previous conversation expired, so we started a new one.')
+          }
+          updateReply(() => data.response || '')
+        } else if (event === 'error') {
+          sessionIdRef.current = data.session_id || sessionIdRef.current
+          if (data.session_expired) {
+            toast.info('Your previous conversation expired, so we started a new one.')
+          }
+          updateReply((content) => (content ? `${content}\n\n${data.response}` : data.response))
+        }
+      })
     } catch (error) {
       console.error('Error sending message:', error)
       toast.error('Failed to send message. Please try again.')
@@ -75,13 +126,15 @@ export function useChatBot() {
       setMessages((prev) => [...prev, mockResponse])
     } finally {
       setLoadingIndicator(false)
+      setIsStreaming(false)
     }
-  }, [messages])
+  }, [])
 
   return {
     messages,
     sendMessage,
     recommendations,
     loadingIndicator,
+    isStreaming,
   }
-}
\ No newline at end of file
+}